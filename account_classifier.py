@@ -0,0 +1,207 @@
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+
+TRAINING_FILE = os.environ.get("QBO_TRAINING_FILE", os.path.join(os.path.expanduser("~"), ".cache", "table_extraction", "qbo_training_log.csv"))
+TRAINING_COLUMNS = ["Description", "Vendor Name", "Account", "Source", "Logged At"]
+SOURCE_PRIORITY = {"model": 0, "correction": 1}  # ✅ A user's correction beats any model answer for the same description
+NEIGHBOURS = 5
+MIN_SIMILARITY = 0.35  # ✅ Nearest past transaction must share at least this much TF-IDF weight
+MIN_CONFIDENCE = 0.6  # ✅ Similarity-weighted vote share the winning (vendor, account) needs
+MAX_DOC_SHARE = 0.5  # ✅ Words in more than half the history ("purchase", "card") carry no signal and are not indexed
+QUERY_CHUNK = 256
+MAX_CHUNK_PAIRS = 4_000_000  # ✅ Upper bound on (query, training row) pairs scored at once, so memory stays flat as the log grows
+
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9&'.*-]*")
+_cached = {}
+
+
+def _words(text):
+    """Lowercase words with at least one letter, so dates, amounts and card numbers drop out."""
+    return [word.strip(".*-") for word in _TOKEN.findall(str(text).lower()) if any(c.isalpha() for c in word)]
+
+
+def normalize_description(text):
+    """Transactions that differ only in dates, amounts or card numbers share a key."""
+    return " ".join(_words(text))
+
+
+def tokenize(text):
+    words = _words(text)
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class AccountClassifier:
+    """TF-IDF + k-nearest-neighbours over past transactions, predicting a (Vendor Name, Account) pair.
+
+    Training rows are stored as a term-sorted posting list, so scoring a batch
+    is a handful of NumPy gathers over the (query, training row) pairs that
+    share a term, followed by a top-k per query, never a dense matrix.
+    """
+
+    def __init__(self, neighbours=NEIGHBOURS):
+        self.neighbours = neighbours
+        self.vocabulary = {}
+
+    def _vectorize(self, texts, grow=False):
+        """Sparse rows as (row, term, weight) arrays, sublinear TF, L2-normalized."""
+        rows, terms, counts = [], [], []
+        for row, text in enumerate(texts):
+            tf = {}
+            for token in tokenize(text):
+                term = self.vocabulary.get(token)
+                if term is None:
+                    if not grow:
+                        continue
+                    term = self.vocabulary[token] = len(self.vocabulary)
+                tf[term] = tf.get(term, 0) + 1
+            rows.extend([row] * len(tf))
+            terms.extend(tf)
+            counts.extend(tf.values())
+        return np.array(rows, dtype=np.int64), np.array(terms, dtype=np.int64), np.array(counts, dtype=np.float32)
+
+    def _weights(self, rows, terms, counts, n_rows):
+        values = (1 + np.log(counts)) * self.idf[terms]
+        norms = np.sqrt(np.bincount(rows, weights=values * values, minlength=n_rows))
+        return (values / np.maximum(norms[rows], 1e-12)).astype(np.float32)
+
+    def fit(self, texts, labels):
+        self.vocabulary = {}
+        rows, terms, counts = self._vectorize(texts, grow=True)
+        n_docs = len(texts)
+        doc_freq = np.bincount(terms, minlength=len(self.vocabulary))
+        self.idf = (np.log((1 + n_docs) / (1 + doc_freq)) + 1).astype(np.float32)
+        if n_docs >= 20:
+            self.idf[doc_freq > n_docs * MAX_DOC_SHARE] = 0
+        values = self._weights(rows, terms, counts, n_docs)
+        keep = values > 0
+        rows, terms, values = rows[keep], terms[keep], values[keep]
+        order = np.argsort(terms, kind="stable")
+        self._posting_rows, self._posting_values = rows[order], values[order]
+        self._term_ptr = np.concatenate([[0], np.cumsum(np.bincount(terms, minlength=len(self.vocabulary)))])
+        label_index = {}
+        self._label_ids = np.array([label_index.setdefault(label, len(label_index)) for label in labels], dtype=np.int64)
+        self.labels = np.empty(len(label_index), dtype=object)
+        self.labels[:] = list(label_index)
+        self.n_train = n_docs
+        return self
+
+    def _neighbours(self, texts, k):
+        """Top-k training rows per query by cosine similarity, as (query, training row, similarity) arrays.
+
+        Only pairs sharing at least one term are scored; queries without any
+        come back with no neighbours.
+        """
+        rows, terms, counts = self._vectorize(texts)
+        empty = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0))
+        if not len(rows):
+            return empty
+        values = self._weights(rows, terms, counts, len(texts))
+        keep = values > 0
+        rows, terms, values = rows[keep], terms[keep], values[keep]
+        starts, lengths = self._term_ptr[terms], np.diff(self._term_ptr)[terms]
+        if not lengths.sum():
+            return empty
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        pairs, inverse = np.unique(np.repeat(rows, lengths) * self.n_train + self._posting_rows[offsets], return_inverse=True)
+        scores = np.bincount(inverse, weights=np.repeat(values, lengths) * self._posting_values[offsets])
+        query, train = np.divmod(pairs, self.n_train)
+        order = np.lexsort((-scores, query))  # ✅ Grouped by query, best match first
+        query, train, scores = query[order], train[order], scores[order]
+        group_starts = np.flatnonzero(np.r_[True, query[1:] != query[:-1]])
+        rank = np.arange(len(query)) - np.repeat(group_starts, np.diff(np.r_[group_starts, len(query)]))
+        top = rank < k
+        return query[top], train[top], scores[top]
+
+    def predict(self, texts):
+        """Returns (labels, confidence, top similarity) arrays; confidence is the winner's share of the neighbour vote.
+
+        A description sharing no indexed word with the history gets label None.
+        """
+        texts = list(texts)
+        labels = np.empty(len(texts), dtype=object)
+        confidence = np.zeros(len(texts))
+        similarity = np.zeros(len(texts))
+        k = min(self.neighbours, self.n_train)
+        chunk_size = int(np.clip(MAX_CHUNK_PAIRS // max(self.n_train, 1), 1, QUERY_CHUNK))
+        for start in range(0, len(texts), chunk_size):
+            chunk = texts[start:start + chunk_size]
+            query, train, scores = self._neighbours(chunk, k)
+            # ✅ Similarity-weighted vote per (query, label), then the best label per query
+            votes_key, inverse = np.unique(query * len(self.labels) + self._label_ids[train], return_inverse=True)
+            votes = np.bincount(inverse, weights=scores)
+            vote_query, vote_label = np.divmod(votes_key, len(self.labels))
+            order = np.lexsort((-votes, vote_query))
+            first = order[np.r_[True, vote_query[order][1:] != vote_query[order][:-1]]] if len(order) else order
+            winners = vote_query[first]
+            total = np.bincount(query, weights=scores, minlength=len(chunk))
+            best = np.zeros(len(chunk))
+            np.maximum.at(best, query, scores)
+            labels[start + winners] = self.labels[vote_label[first]]
+            confidence[start + winners] = np.divide(votes[first], total[winners], out=np.zeros(len(first)), where=total[winners] > 0)
+            similarity[start:start + len(chunk)] = best
+        return labels, confidence, similarity
+
+
+def log_classifications(df, source, path=TRAINING_FILE):
+    """Appends classified (or corrected) transactions to the training log."""
+    rows = df[["Description", "Vendor Name", "Account"]].dropna()
+    if rows.empty:
+        return
+    rows = rows.assign(Source=source, **{"Logged At": time.strftime("%Y-%m-%d %H:%M:%S")})
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    rows[TRAINING_COLUMNS].to_csv(path, mode="a", header=not os.path.exists(path), index=False)
+
+
+def load_training(path=TRAINING_FILE):
+    """Latest label per description, corrections taking precedence over model answers."""
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=TRAINING_COLUMNS)
+    df = pd.read_csv(path, dtype=str).dropna(subset=["Description", "Vendor Name", "Account"])
+    df["key"] = df["Description"].map(normalize_description)
+    df["priority"] = df["Source"].map(SOURCE_PRIORITY).fillna(0)
+    df = df.sort_values("priority", kind="stable").drop_duplicates("key", keep="last")
+    return df.drop(columns=["key", "priority"]).reset_index(drop=True)
+
+
+def load_classifier(path=TRAINING_FILE):
+    """Classifier fitted on the training log, refitted only when the log changes; None if there is no history."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    if key not in _cached:
+        training = load_training(path)
+        if training.empty:
+            return None
+        labels = list(zip(training["Vendor Name"], training["Account"]))
+        _cached.clear()
+        _cached[key] = AccountClassifier().fit(training["Description"].tolist(), labels)
+    return _cached[key]
+
+
+def classify_locally(descriptions, vendors, accounts, classifier):
+    """Predicts Vendor Name and Account per description.
+
+    Returns a DataFrame with Description, Vendor Name, Account and Confidence,
+    plus a boolean Series of rows confident enough to skip the model. A
+    prediction whose vendor or account is missing from the uploaded lists is
+    never confident.
+    """
+    descriptions = list(descriptions)
+    labels, confidence, similarity = classifier.predict(descriptions)
+    predicted = pd.DataFrame({
+        "Description": descriptions,
+        "Vendor Name": [label[0] if label else None for label in labels],
+        "Account": [label[1] if label else None for label in labels],
+        "Confidence": confidence.round(3),
+    })
+    known_vendor = predicted["Vendor Name"].isin(set(vendors) | {"Unknown"})
+    known_account = predicted["Account"].isin(set(accounts))
+    confident = (confidence >= MIN_CONFIDENCE) & (similarity >= MIN_SIMILARITY) & known_vendor & known_account
+    return predicted, pd.Series(confident, index=predicted.index)
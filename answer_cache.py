@@ -0,0 +1,81 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+
+ANSWER_CACHE_FILE = os.environ.get("ANSWER_CACHE_FILE", os.path.join(os.path.expanduser("~"), ".cache", "table_extraction", "insights_cache.json"))
+MAX_CACHED_ANSWERS = int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", "500"))
+
+
+def dataset_fingerprint(df):
+    """Content hash of a transaction frame; any feedback edit gives a new fingerprint."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps(list(map(str, df.columns))).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def normalize_question(question):
+    """Case, spacing and trailing punctuation don't change the question."""
+    return re.sub(r"\s+", " ", question).strip().rstrip("?!. ").casefold()
+
+
+def answer_key(question, fingerprint, model):
+    return hashlib.sha256(json.dumps([normalize_question(question), fingerprint, model]).encode()).hexdigest()
+
+
+class AnswerCache:
+    """Insights answers by (question, dataset fingerprint, model), kept in a JSON file shared by every session."""
+
+    def __init__(self, path=ANSWER_CACHE_FILE, max_entries=MAX_CACHED_ANSWERS):
+        self.path = path
+        self.max_entries = max_entries
+        self._entries = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _reload(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            self._entries = {}  # ✅ A corrupt cache file only costs fresh answers
+        self._mtime = mtime
+
+    def get(self, key):
+        with self._lock:
+            self._reload()
+            entry = self._entries.get(key)
+            return entry["answer"] if entry else None
+
+    def put(self, key, answer, **meta):
+        with self._lock:
+            self._reload()
+            self._entries[key] = {"answer": answer, "ts": time.time(), **meta}
+            if len(self._entries) > self.max_entries:
+                oldest = sorted(self._entries, key=lambda k: self._entries[k]["ts"])
+                for stale in oldest[:len(self._entries) - self.max_entries]:
+                    del self._entries[stale]
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(self._entries, f)
+                os.replace(tmp_path, self.path)  # ✅ Other sessions never read a half-written file
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+            self._mtime = os.stat(self.path).st_mtime_ns
@@ -0,0 +1,96 @@
+"""PDF text backend benchmark: pages/sec and extraction fidelity per engine.
+
+Fidelity is the difflib line-similarity of each engine's page text to
+pdfplumber's (the layout the prompts were tuned on). When a ground-truth
+JSON from make_statements.py sits next to a PDF, row coverage is the share
+of true transaction descriptions found in the engine's text.
+
+    python benchmarks/bench_pdf_backends.py statements/
+    python benchmarks/bench_pdf_backends.py a.pdf --engines pdfium pdfplumber --plain --json backends.json
+"""
+import argparse
+import difflib
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pdf_backends import PDF_ENGINES, available_engines, extract_pages  # noqa: E402
+from bench_pipeline import collect_pdfs  # noqa: E402
+
+
+def line_similarity(pages, reference_pages):
+    """Mean difflib ratio of page lines against the reference, page by page."""
+    reference = dict(reference_pages)
+    ratios = []
+    for page_num, text in pages:
+        expected = reference.get(page_num, "")
+        ratios.append(difflib.SequenceMatcher(None, text.splitlines(), expected.splitlines(), autojunk=False).ratio())
+    missing = len(set(reference) - {page_num for page_num, _ in pages})
+    return sum(ratios) / (len(ratios) + missing) if ratios or missing else 1.0
+
+
+def row_coverage(path, pages):
+    truth_path = os.path.splitext(path)[0] + ".json"
+    if not os.path.exists(truth_path):
+        return None
+    with open(truth_path, encoding="utf-8") as f:
+        descriptions = [row["Description"] for row in json.load(f)["transactions"]]
+    text = "\n".join(page_text for _, page_text in pages)
+    return sum(description in text for description in descriptions) / max(len(descriptions), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="PDF files or directories of PDFs")
+    parser.add_argument("--engines", nargs="+", choices=PDF_ENGINES, help="default: every installed engine plus auto")
+    parser.add_argument("--plain", action="store_true", help="plain page text instead of the compact column layout")
+    parser.add_argument("--json", help="write results to this JSON file")
+    args = parser.parse_args()
+
+    pdfs = collect_pdfs(args.paths)
+    if not pdfs:
+        parser.error("no PDF files found")
+    engines = args.engines or available_engines()
+    layout = not args.plain
+
+    references = {path: extract_pages(path, "pdfplumber", layout)[0] for path in pdfs}
+    results = []
+    for engine in engines:
+        pages_total, seconds, similarity, coverage, chosen = 0, 0.0, [], [], []
+        for path in pdfs:
+            started = time.perf_counter()
+            pages, used = extract_pages(path, engine, layout)
+            seconds += time.perf_counter() - started
+            pages_total += len(pages)
+            chosen.append(used)
+            similarity.append(line_similarity(pages, references[path]))
+            score = row_coverage(path, pages)
+            if score is not None:
+                coverage.append(score)
+        results.append({
+            "engine": engine,
+            "pages": pages_total,
+            "seconds": round(seconds, 3),
+            "pages_per_sec": round(pages_total / seconds, 1) if seconds else 0.0,
+            "fidelity_vs_pdfplumber": round(sum(similarity) / len(similarity), 4),
+            "row_coverage": round(sum(coverage) / len(coverage), 4) if coverage else None,
+            "engines_used": sorted(set(chosen)),
+        })
+
+    width = max(len(r["engine"]) for r in results)
+    print(f"{'engine':<{width}}  {'pages':>6}  {'seconds':>8}  {'pages/s':>8}  {'fidelity':>8}  {'rows':>6}  used")
+    for r in results:
+        coverage = "-" if r["row_coverage"] is None else r["row_coverage"]
+        print(f"{r['engine']:<{width}}  {r['pages']:>6}  {r['seconds']:>8}  {r['pages_per_sec']:>8}  "
+              f"{r['fidelity_vs_pdfplumber']:>8}  {coverage:>6}  {', '.join(r['engines_used'])}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""Offline throughput benchmark for the statement pipeline.
+
+Starts the local stub LLM, points statement_pipeline.DEEPSEEK_API_URL at it
+and runs PDFs through process_document the way the Single and Bulk tabs
+do. Reports pages/sec, p50/p95/p99 page latency and peak RSS. Each mode
+runs in its own subprocess so peak RSS is measured per mode. When a PDF
+has a ground-truth JSON next to it (see make_statements.py), row
+precision/recall are reported too.
+
+    python benchmarks/make_statements.py --out statements --documents 10 --pages 100
+    python benchmarks/bench_pipeline.py statements/ --latency-ms 300 --jitter-ms 100
+    python benchmarks/bench_pipeline.py a.pdf b.pdf --mode bulk --json bench.json
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_llm_server import StubLLMServer  # noqa: E402
+
+
+def collect_pdfs(paths):
+    pdfs = []
+    for path in paths:
+        if os.path.isdir(path):
+            pdfs.extend(sorted(os.path.join(path, name) for name in os.listdir(path) if name.lower().endswith(".pdf")))
+        else:
+            pdfs.append(path)
+    return pdfs
+
+
+def _row_keys(records):
+    """Date + amounts in cents identify a row for accuracy matching."""
+    return Counter(
+        (str(r["Date"]), int(round(float(r["Deposits_Credits"]) * 100)), int(round(float(r["Withdrawals_Debits"]) * 100)))
+        for r in records
+    )
+
+
+def score_against_truth(path, df):
+    """Returns (matched, extracted, expected) row counts, or None without a ground-truth file."""
+    truth_path = os.path.splitext(path)[0] + ".json"
+    if not os.path.exists(truth_path):
+        return None
+    with open(truth_path, encoding="utf-8") as f:
+        expected = _row_keys(json.load(f)["transactions"])
+    from transactions import to_display_frame
+
+    extracted = _row_keys(to_display_frame(df).to_dict("records")) if df is not None else Counter()
+    return sum((expected & extracted).values()), sum(extracted.values()), sum(expected.values())
+
+
+def load_vendors(pdfs, vendors_path):
+    """Reads the Payee list given with --vendors, or vendors.csv next to the PDFs."""
+    from statement_pipeline import load_vendor_list
+
+    vendors_path = vendors_path or os.path.join(os.path.dirname(pdfs[0]), "vendors.csv")
+    if not os.path.exists(vendors_path):
+        return []
+    with open(vendors_path, "rb") as f:
+        return load_vendor_list(f)
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KiB on Linux
+
+
+def run_mode(mode, pdfs, args):
+    """Runs one benchmark mode in this process and returns its result dict."""
+    import statement_pipeline
+    from pipeline_metrics import bind, new_run_id
+
+    page_latencies = []
+    original = statement_pipeline.categorize_page
+
+    def timed_categorize_page(*call_args, **call_kwargs):
+        started = time.perf_counter()
+        try:
+            return original(*call_args, **call_kwargs)
+        finally:
+            page_latencies.append(time.perf_counter() - started)
+
+    statement_pipeline.categorize_page = timed_categorize_page
+    documents = pdfs[:1] if mode == "single" else pdfs
+    vendor_list = load_vendors(pdfs, args.vendors)
+    matched = extracted = expected = 0
+    scored = False
+
+    with StubLLMServer(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+                       year=args.year, seed=args.seed) as stub:
+        statement_pipeline.DEEPSEEK_API_URL = stub.url
+        pages = rows = skipped = reconciled = 0
+        run_id = new_run_id()  # ✅ Spans go to --metrics-file, never the app's production metrics
+        started = time.perf_counter()
+        for path in documents:
+            with bind(run_id=run_id, mode=f"bench-{mode}"):
+                df, info = statement_pipeline.process_document(path, vendor_list, "stub-key", "DeepSeek", document=os.path.basename(path),
+                                                               skip_pages=not args.no_triage, tiered=args.tiered,
+                                                               pdf_engine=args.pdf_engine)
+            pages += info["pages"]
+            skipped += len(info["skipped_pages"])
+            rows += 0 if df is None else len(df)
+            reconciled += bool(info["reconciliation"] and info["reconciliation"]["status"] == "reconciled")
+            score = score_against_truth(path, df)
+            if score:
+                scored = True
+                matched, extracted, expected = matched + score[0], extracted + score[1], expected + score[2]
+        elapsed = time.perf_counter() - started
+        requests_made, errors = stub.request_count, stub.error_count
+
+    latencies_ms = np.array(page_latencies) * 1000 if page_latencies else np.zeros(1)
+    return {
+        "mode": mode,
+        "documents": len(documents),
+        "pages": pages,
+        "llm_calls": requests_made,
+        "llm_errors": errors,
+        "skipped_pages": skipped,
+        "rows": rows,
+        "reconciled_documents": reconciled,
+        "seconds": round(elapsed, 3),
+        "pages_per_sec": round(pages / elapsed, 2) if elapsed else 0.0,
+        "p50_page_ms": round(float(np.percentile(latencies_ms, 50)), 1),
+        "p95_page_ms": round(float(np.percentile(latencies_ms, 95)), 1),
+        "p99_page_ms": round(float(np.percentile(latencies_ms, 99)), 1),
+        "row_precision": round(matched / extracted, 4) if scored and extracted else None,
+        "row_recall": round(matched / expected, 4) if scored and expected else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def print_table(results):
+    columns = ["mode", "documents", "pages", "llm_calls", "llm_errors", "skipped_pages", "rows", "reconciled_documents",
+               "seconds", "pages_per_sec", "p50_page_ms", "p95_page_ms", "p99_page_ms", "row_precision", "row_recall", "peak_rss_mb"]
+    width = max(len(c) for c in columns)
+    for column in columns:
+        print(f"{column:<{width}}  " + "  ".join(f"{str(r[column]):>12}" for r in results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="PDF files or directories of PDFs")
+    parser.add_argument("--mode", choices=["single", "bulk", "both"], default="both")
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--year", type=int, default=2023)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--vendors", help="Payee CSV for the prompt (default: vendors.csv next to the PDFs)")
+    parser.add_argument("--no-triage", action="store_true", help="send every page to the model")
+    parser.add_argument("--pdf-engine", default="auto", help="PDF text backend (auto, pymupdf, pdfium, pdfplumber, pypdf)")
+    parser.add_argument("--tiered", action="store_true", help="fast model first, escalate on failed validation")
+    parser.add_argument("--json", help="write results to this JSON file")
+    parser.add_argument("--metrics-file", default=os.path.join(tempfile.gettempdir(), "bench_pipeline_metrics.jsonl"),
+                        help="pipeline metrics JSON-lines file for the benchmark runs (view with PIPELINE_METRICS_FILE=... in the app)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    pdfs = collect_pdfs(args.paths)
+    if not pdfs:
+        parser.error("no PDF files found")
+
+    if args.child:
+        print(json.dumps(run_mode(args.mode, pdfs, args)))
+        return
+
+    modes = ["single", "bulk"] if args.mode == "both" else [args.mode]
+    results = []
+    for mode in modes:
+        # ✅ Fresh interpreter per mode so ru_maxrss is that mode's peak only
+        command = [sys.executable, os.path.abspath(__file__), *pdfs, "--mode", mode, "--child",
+                   "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+                   "--error-rate", str(args.error_rate), "--year", str(args.year), "--seed", str(args.seed)]
+        if args.no_triage:
+            command.append("--no-triage")
+        if args.tiered:
+            command.append("--tiered")
+        command += ["--pdf-engine", args.pdf_engine]
+        if args.vendors:
+            command += ["--vendors", args.vendors]
+        env = {**os.environ, "PIPELINE_METRICS_FILE": args.metrics_file}
+        output = subprocess.run(command, check=True, capture_output=True, text=True, env=env).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Cold-start benchmark for the Streamlit apps and pipeline modules.
+
+Each measurement runs in a fresh interpreter. "lazy" is the time to import
+the module (or run the app script once with no uploads) as shipped; "eager"
+first imports the provider SDK, charting stack and PDF backends the way the
+modules used to at top level. The heavy modules actually loaded by the lazy
+run are listed, so a regression back to top-level imports shows up.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --repeat 5 --json startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ["langchain_google_genai", "plotly.express", "pdfplumber", "PyPDF2"]
+TARGETS = {
+    "statement_pipeline": "import statement_pipeline",
+    "uploads": "import uploads",
+    "bulk app (first run)": "run_app('bulk_table_extraction_with_analytics.py')",
+    "single app (first run)": "run_app('single_table_extraction.py')",
+    "qbo app (first run)": "run_app('qbo.py')",
+}
+
+CHILD = """
+import importlib, json, sys, time
+sys.path.insert(0, {root!r})
+
+def run_app(script):
+    from streamlit.testing.v1 import AppTest
+    AppTest.from_file(script, default_timeout=120).run()
+
+import streamlit  # ✅ Streamlit is loaded by the server before any script runs, so it is not counted
+started = time.perf_counter()
+for name in {preload!r}:
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        pass
+{statement}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(statement, preload):
+    code = CHILD.format(root=ROOT, preload=preload, statement=statement, heavy=HEAVY_MODULES)
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters per measurement (median is reported)")
+    parser.add_argument("--only", choices=list(TARGETS), action="append", help="limit to these targets")
+    parser.add_argument("--json", help="write results to this JSON file")
+    args = parser.parse_args()
+
+    results = []
+    for name in args.only or list(TARGETS):
+        lazy = [measure(TARGETS[name], []) for _ in range(args.repeat)]
+        eager = [measure(TARGETS[name], HEAVY_MODULES) for _ in range(args.repeat)]
+        lazy_seconds = statistics.median(r["seconds"] for r in lazy)
+        eager_seconds = statistics.median(r["seconds"] for r in eager)
+        results.append({
+            "target": name,
+            "lazy_s": round(lazy_seconds, 3),
+            "eager_s": round(eager_seconds, 3),
+            "saved_s": round(eager_seconds - lazy_seconds, 3),
+            "heavy_loaded": lazy[0]["loaded"],
+        })
+
+    width = max(len(r["target"]) for r in results)
+    print(f"{'target':<{width}}  {'lazy_s':>8}  {'eager_s':>8}  {'saved_s':>8}  heavy modules loaded")
+    for r in results:
+        print(f"{r['target']:<{width}}  {r['lazy_s']:>8}  {r['eager_s']:>8}  {r['saved_s']:>8}  {', '.join(r['heavy_loaded']) or '-'}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""Synthetic bank-statement PDF generator for scale and accuracy testing.
+
+Writes multi-page statements in the layout the extraction prompts expect
+(summary page with opening/closing balances, transaction pages with Date,
+Description, Deposits/Additions, Withdrawals/Subtractions and Ending daily
+balance columns, a disclosure page) plus ground-truth JSON next to each PDF
+and a vendors.csv with a Payee column. No real PII; no PDF library needed.
+
+    python benchmarks/make_statements.py --out /tmp/statements --documents 10 --pages 100
+    python benchmarks/bench_pipeline.py /tmp/statements
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+
+
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792
+FONT_SIZE = 8
+ROW_HEIGHT = 11
+COLUMNS = {"date": 40, "description": 80, "deposits": 340, "withdrawals": 460, "balance": 570}  # right edges for amounts
+HELVETICA_WIDTHS = {**{d: 556 for d in "0123456789$"}, ",": 278, ".": 278, "-": 333}
+
+VENDORS = [
+    ("Amazon", "Purchase authorized on {md} AMAZON MKTPLACE PMTS WA Card {card}"),
+    ("Dell", "Purchase authorized on {md} DELL SALES & SERVICE TX Card {card}"),
+    ("Shell", "Purchase authorized on {md} SHELL OIL {ref} FORT MYERS FL"),
+    ("Staples", "Purchase authorized on {md} STAPLES {ref} Card {card}"),
+    ("Comcast", "COMCAST CABLE COMM {ref} Recurring Payment"),
+    ("Home Depot", "Purchase authorized on {md} THE HOME DEPOT #{ref}"),
+    ("Uber", "Purchase authorized on {md} UBER TRIP HELP.UBER.COM CA"),
+    ("Overdraft Fee", "Overdraft Fee on {md} item ${item}"),  # ✅ An amount inside the description
+    ("Monthly Service Fee", "Monthly Service Fee"),
+]
+DEPOSITS = [
+    ("ATM", "ATM Cash Deposit on {md} {ref} Heitman St Fort Myers FL"),
+    ("Mobile Deposit", "Mobile Deposit : Ref Number :{ref}"),
+    ("ADP Payroll", "ADP PAYROLL {ref} Direct Dep"),
+    ("Stripe", "STRIPE TRANSFER ST-{ref} Online Transfer"),
+]
+DISCLOSURE = [
+    "In case of errors or questions about your electronic transfers:",
+    "Telephone us at the number printed on the front of this statement or write us as soon as you can.",
+    "We must hear from you no later than 60 days after we sent you the FIRST statement on which the problem appeared.",
+    "Important Account Information",
+    "Fee schedule and terms and conditions for your account are available at any branch. Member FDIC.",
+]
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _text_width(text):
+    return sum(HELVETICA_WIDTHS.get(ch, 500) for ch in text) * FONT_SIZE / 1000
+
+
+class PdfPage:
+    """Collects text operations for one page."""
+
+    def __init__(self):
+        self.ops = []
+
+    def text(self, x, y, text, right=False):
+        if right:
+            x -= _text_width(text)
+        self.ops.append(f"BT /F1 {FONT_SIZE} Tf {x:.2f} {y:.2f} Td ({_escape(text)}) Tj ET")
+
+    def stream(self):
+        return "\n".join(self.ops).encode("latin-1", "replace")
+
+
+def write_pdf(path, pages):
+    """Writes pages as a minimal PDF 1.4 file with the standard Helvetica font."""
+    objects = [None, None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"]
+    page_ids = []
+    for page in pages:
+        content = page.stream()
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+            % (PAGE_WIDTH, PAGE_HEIGHT, content_id)
+        )
+        page_ids.append(len(objects))
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % i for i in page_ids), len(page_ids))
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+
+def _money(cents):
+    sign = "-" if cents < 0 else ""
+    return f"{sign}{abs(cents) / 100:,.2f}"
+
+
+def generate_transactions(rng, count, start, days):
+    """Builds count transactions spread over the period, sorted by date."""
+    transactions = []
+    for _ in range(count):
+        date = start + datetime.timedelta(days=rng.randrange(days))
+        is_deposit = rng.random() < 0.25
+        vendor, template = rng.choice(DEPOSITS if is_deposit else VENDORS)
+        card, ref = rng.randrange(1000, 9999), rng.randrange(10000, 99999)
+        description = template.format(md=date.strftime("%m/%d"), card=card, ref=ref, item=_money(ref))
+        cents = rng.randrange(50_000, 500_000) if is_deposit else rng.randrange(500, 60_000)
+        transactions.append({
+            "date": date,
+            "Description": description[:36].strip(),
+            "Deposits_Credits": cents if is_deposit else 0,
+            "Withdrawals_Debits": 0 if is_deposit else cents,
+            "Vendor Name": vendor,
+        })
+    transactions.sort(key=lambda t: t["date"])
+    return transactions
+
+
+def build_statement(rng, pages, rows_per_page, start, days, account):
+    """Returns (pdf pages, ground truth dict) for one statement."""
+    transactions = generate_transactions(rng, pages * rows_per_page, start, days)
+    opening = rng.randrange(100_000, 2_000_000)
+    end = start + datetime.timedelta(days=days - 1)
+    # ✅ Last row: a description with amounts in it, on a day whose balance row is not printed
+    transactions.append({"date": end, "Description": f"OD Fee on {end:%m/%d} $143.00 Dell 35.00", "Deposits_Credits": 0,
+                         "Withdrawals_Debits": 3500, "Vendor Name": "Overdraft Fee"})
+    closing = opening + sum(t["Deposits_Credits"] - t["Withdrawals_Debits"] for t in transactions)
+    total_pages = pages + 2
+    pdf_pages = []
+
+    def header(page, number):
+        page.text(40, 760, "Sample Bank Everyday Checking")
+        page.text(400, 760, f"Account number: XXXXXX{account}")
+        page.text(40, 30, f"Page {number} of {total_pages}")
+
+    summary = PdfPage()
+    header(summary, 1)
+    summary.text(40, 720, f"Statement period {start:%m/%d/%Y} - {end:%m/%d/%Y}")
+    summary.text(40, 700, "Activity summary")
+    summary.text(40, 685, f"Beginning balance on {start.month}/{start.day}")
+    summary.text(300, 685, "$" + _money(opening), right=True)
+    summary.text(40, 672, "Deposits/Additions")
+    summary.text(300, 672, _money(sum(t["Deposits_Credits"] for t in transactions)), right=True)
+    summary.text(40, 659, "Withdrawals/Subtractions")
+    summary.text(300, 659, "-" + _money(sum(t["Withdrawals_Debits"] for t in transactions)), right=True)
+    summary.text(40, 646, f"Ending balance on {end.month}/{end.day}")
+    summary.text(300, 646, "$" + _money(closing), right=True)
+    pdf_pages.append(summary)
+
+    balance = opening
+    truth_rows = []
+    for page_index in range(pages):
+        page = PdfPage()
+        number = page_index + 2
+        header(page, number)
+        page.text(40, 730, "Transaction history")
+        y = 712
+        page.text(COLUMNS["date"], y, "Date")
+        page.text(COLUMNS["description"], y, "Description")
+        page.text(COLUMNS["deposits"], y, "Deposits/Additions", right=True)
+        page.text(COLUMNS["withdrawals"], y, "Withdrawals/Subtractions", right=True)
+        page.text(COLUMNS["balance"], y, "Ending daily balance", right=True)
+        y -= ROW_HEIGHT + 4
+
+        rows = transactions[page_index * rows_per_page:(page_index + 1) * rows_per_page if page_index + 1 < pages else None]
+        for row_index, tx in enumerate(rows):
+            balance += tx["Deposits_Credits"] - tx["Withdrawals_Debits"]
+            page.text(COLUMNS["date"], y, f"{tx['date']:%m/%d}")
+            page.text(COLUMNS["description"], y, tx["Description"])
+            if tx["Deposits_Credits"]:
+                page.text(COLUMNS["deposits"], y, _money(tx["Deposits_Credits"]), right=True)
+            if tx["Withdrawals_Debits"]:
+                page.text(COLUMNS["withdrawals"], y, _money(tx["Withdrawals_Debits"]), right=True)
+            # ✅ The ending daily balance is printed on the last row of each day on the page, except for the
+            # statement's last day, which the ending balance on the summary page covers
+            next_row = rows[row_index + 1] if row_index + 1 < len(rows) else None
+            if (next_row is None or next_row["date"] != tx["date"]) and tx["date"] != end:
+                page.text(COLUMNS["balance"], y, _money(balance), right=True)
+            y -= ROW_HEIGHT
+            truth_rows.append({
+                "Date": f"{tx['date']:%m/%d/%Y}",
+                "Description": tx["Description"],
+                "Deposits_Credits": tx["Deposits_Credits"] / 100,
+                "Withdrawals_Debits": tx["Withdrawals_Debits"] / 100,
+                "Vendor Name": tx["Vendor Name"],
+                "Page": number,
+            })
+        pdf_pages.append(page)
+
+    disclosure = PdfPage()
+    header(disclosure, total_pages)
+    for offset, line in enumerate(DISCLOSURE):
+        disclosure.text(40, 720 - offset * 14, line)
+    pdf_pages.append(disclosure)
+
+    truth = {"opening_balance": opening / 100, "closing_balance": closing / 100, "pages": total_pages, "transactions": truth_rows}
+    return pdf_pages, truth
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", required=True, help="output directory")
+    parser.add_argument("--documents", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=10, help="transaction pages per statement")
+    parser.add_argument("--rows-per-page", type=int, default=45)
+    parser.add_argument("--start", default="2023-01-01", help="first day of every statement period")
+    parser.add_argument("--days", type=int, default=30, help="statement period length (kept within one year)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    start = datetime.date.fromisoformat(args.start)
+    days = min(args.days, (datetime.date(start.year, 12, 31) - start).days + 1)  # MM/DD rows carry no year
+    os.makedirs(args.out, exist_ok=True)
+
+    total_pages = 0
+    for index in range(args.documents):
+        name = f"statement_{index + 1:04d}"
+        pages, truth = build_statement(rng, args.pages, args.rows_per_page, start, days, rng.randrange(1000, 9999))
+        write_pdf(os.path.join(args.out, f"{name}.pdf"), pages)
+        with open(os.path.join(args.out, f"{name}.json"), "w", encoding="utf-8") as f:
+            json.dump(dict(truth, document=f"{name}.pdf"), f, indent=1)
+        total_pages += truth["pages"]
+
+    with open(os.path.join(args.out, "vendors.csv"), "w", encoding="utf-8") as f:
+        f.write("Payee\n" + "\n".join(vendor for vendor, _ in VENDORS + DEPOSITS) + "\n")
+    print(f"Wrote {args.documents} statements ({total_pages} pages) to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""Local OpenAI-compatible stub for offline pipeline benchmarks.
+
+Serves POST /v1/chat/completions with configurable latency, error rate and
+either canned responses or transactions parsed back out of the prompt's
+statement text, so the rest of the pipeline sees realistic output.
+
+    python benchmarks/stub_llm_server.py --port 8089 --latency-ms 800 --error-rate 0.02
+    DEEPSEEK_API_URL=http://127.0.0.1:8089/v1/chat/completions streamlit run bulk_table_extraction_with_analytics.py
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from page_triage import ROW_DATE_PATTERN, AMOUNT_PATTERN  # noqa: E402
+
+
+STATEMENT_SECTION = re.compile(r"\*\*Statement Text:\*\*(.*?)\*\*Output Format", re.DOTALL)
+NUMERIC_DATE = re.compile(r"^(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?")
+DEPOSIT_WORDS = ("deposit", "credit", "addition")
+WITHDRAWAL_WORDS = ("withdrawal", "debit", "subtraction")
+
+
+def _amount(text):
+    return float(text.replace("$", "").replace(",", ""))
+
+
+def transactions_from_prompt(prompt, year):
+    """Parses dated rows of the prompt's statement text back into transaction dicts."""
+    match = STATEMENT_SECTION.search(prompt)
+    lines = [line.strip() for line in (match.group(1) if match else prompt).splitlines()]
+    deposit_col = withdrawal_col = None
+    transactions = []
+    for line in lines:
+        cells = line.split("\t")
+        lowered = [cell.lower() for cell in cells]
+        if any(w in cell for cell in lowered for w in DEPOSIT_WORDS) and any(w in cell for cell in lowered for w in WITHDRAWAL_WORDS):
+            deposit_col = next(i for i, cell in enumerate(lowered) if any(w in cell for w in DEPOSIT_WORDS))
+            withdrawal_col = next(i for i, cell in enumerate(lowered) if any(w in cell for w in WITHDRAWAL_WORDS))
+            continue
+        date_match = NUMERIC_DATE.match(line)
+        if not (date_match and ROW_DATE_PATTERN.match(line) and AMOUNT_PATTERN.search(line)):
+            continue
+
+        month, day, row_year = date_match.groups()
+        first_cell = cells[0][date_match.end():].strip()
+        description = " ".join(cell for cell in [first_cell] + cells[1:] if cell.strip() and not AMOUNT_PATTERN.fullmatch(cell.strip()))
+        deposit = withdrawal = 0.0
+        if deposit_col is not None and len(cells) > max(deposit_col, withdrawal_col):
+            deposit = _amount(cells[deposit_col]) if AMOUNT_PATTERN.fullmatch(cells[deposit_col].strip()) else 0.0
+            withdrawal = _amount(cells[withdrawal_col]) if AMOUNT_PATTERN.fullmatch(cells[withdrawal_col].strip()) else 0.0
+        elif deposit_col is not None and len(cells) > deposit_col and AMOUNT_PATTERN.fullmatch(cells[deposit_col].strip()):
+            deposit = _amount(cells[deposit_col])
+        else:
+            withdrawal = _amount(AMOUNT_PATTERN.findall(line)[0])
+        transactions.append({
+            "Date": f"{int(month):02d}/{int(day):02d}/{row_year or year}",
+            "Description": description,
+            "Deposits_Credits": deposit,
+            "Withdrawals_Debits": withdrawal,
+            "Vendor Name": "Unknown",
+        })
+    return transactions
+
+
+class StubLLMServer:
+    """Threaded stub chat-completions endpoint; use as a context manager or call start()/stop()."""
+
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0,
+                 responses=None, year=2023, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.year = year
+        self._responses = itertools.cycle(responses) if responses else None
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.request_count = 0
+        self.error_count = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1/chat/completions"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _next_plan(self):
+        """Draws latency and error outcome for one request under the lock (Random is not thread-safe)."""
+        with self._lock:
+            self.request_count += 1
+            delay = max(0.0, self._random.gauss(self.latency_ms, self.jitter_ms)) / 1000 if self.jitter_ms else self.latency_ms / 1000
+            failed = self._random.random() < self.error_rate
+            status = self._random.choice([429, 500, 503]) if failed else 200
+            if failed:
+                self.error_count += 1
+            canned = next(self._responses) if self._responses and not failed else None
+        return delay, status, canned
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                payload = json.loads(body or b"{}")
+                prompt = "\n".join(m.get("content", "") for m in payload.get("messages", []))
+                delay, status, canned = stub._next_plan()
+                time.sleep(delay)
+
+                if status != 200:
+                    self.send_response(status)
+                    if status == 429:
+                        self.send_header("Retry-After", "1")
+                    self.send_header("Content-Type", "application/json")
+                    self.end_headers()
+                    self.wfile.write(json.dumps({"error": {"message": "stub failure", "code": status}}).encode())
+                    return
+
+                if canned is None:
+                    content = json.dumps(transactions_from_prompt(prompt, stub.year))
+                else:
+                    content = canned if isinstance(canned, str) else json.dumps(canned)
+                response = {
+                    "id": f"stub-{stub.request_count}",
+                    "object": "chat.completion",
+                    "model": payload.get("model", "stub"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                    "usage": {
+                        "prompt_tokens": len(prompt) // 4,
+                        "completion_tokens": len(content) // 4,
+                        "total_tokens": (len(prompt) + len(content)) // 4,
+                    },
+                }
+                data = json.dumps(response).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="mean response latency")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="standard deviation of the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 429/500/503")
+    parser.add_argument("--responses", help="JSON file with a list of canned message contents to cycle through")
+    parser.add_argument("--year", type=int, default=2023, help="year added to MM/DD dates parsed from the prompt")
+    args = parser.parse_args()
+
+    responses = None
+    if args.responses:
+        with open(args.responses, encoding="utf-8") as f:
+            responses = json.load(f)
+
+    server = StubLLMServer(args.host, args.port, args.latency_ms, args.jitter_ms, args.error_rate, responses, args.year)
+    print(f"Stub LLM listening on {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
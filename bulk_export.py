@@ -0,0 +1,260 @@
+import hashlib
+import importlib.util
+import io
+import os
+import tempfile
+import time
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from transactions import to_display_frame
+
+
+EXPORT_COLUMNS = ["Date", "Description", "Deposits_Credits", "Withdrawals_Debits", "Vendor Name", "Document", "Page"]
+EXPORT_FORMATS = {
+    "ZIP (one CSV per document)": (".zip", "application/zip"),
+    "CSV (single file)": (".csv", "text/csv"),
+    "QBO (QuickBooks Web Connect)": (".qbo", "application/vnd.intu.qbo"),
+    "OFX (bank feed)": (".ofx", "application/x-ofx"),
+    "Parquet (single file)": (".parquet", "application/octet-stream"),
+}
+EXPORT_MODULES = {"Parquet (single file)": "pyarrow"}  # ✅ Formats that need an optional package
+CSV_CHUNK_ROWS = 50_000
+
+# ✅ Bank feed account details; QuickBooks matches the file to an account by these
+OFX_BANK_ID = os.environ.get("OFX_BANK_ID", "000000000")
+OFX_ACCOUNT_ID = os.environ.get("OFX_ACCOUNT_ID", "0000000000")
+OFX_ACCOUNT_TYPE = os.environ.get("OFX_ACCOUNT_TYPE", "CHECKING")
+OFX_ORG = os.environ.get("OFX_ORG", "Statement Processor")
+QBO_INTU_BID = os.environ.get("QBO_INTU_BID", "3000")  # ✅ Web Connect bank id QuickBooks expects in .qbo files
+OFX_DATE_PLACEHOLDER = b"00000000"
+
+
+def available_export_formats():
+    """Export formats whose optional packages are installed here."""
+    return [name for name in EXPORT_FORMATS if name not in EXPORT_MODULES or importlib.util.find_spec(EXPORT_MODULES[name])]
+
+
+def read_export(export):
+    """Bytes of a generated export file, read only when the download is clicked."""
+    with open(export[0], "rb") as fileobj:
+        return fileobj.read()
+
+
+def _export_frame(name, df):
+    """Returns the display frame for one document with the fixed export columns."""
+    frame = to_display_frame(df)
+    frame["Document"] = name
+    for column in EXPORT_COLUMNS:
+        if column not in frame.columns:
+            frame[column] = None
+    return frame[EXPORT_COLUMNS]
+
+
+def _csv_member_name(name, used):
+    """Builds a unique CSV file name inside the ZIP for a document."""
+    stem = os.path.splitext(os.path.basename(name))[0] or "document"
+    member = f"{stem}.csv"
+    counter = 1
+    while member in used:
+        counter += 1
+        member = f"{stem}_{counter}.csv"
+    used.add(member)
+    return member
+
+
+def write_zip_export(results, fileobj):
+    """Streams every document into a ZIP, one CSV member at a time."""
+    used = set()
+    with zipfile.ZipFile(fileobj, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, df in results.items():
+            with archive.open(_csv_member_name(name, used), mode="w", force_zip64=True) as member:
+                text = io.TextIOWrapper(member, encoding="utf-8", newline="")
+                _export_frame(name, df).to_csv(text, index=False, chunksize=CSV_CHUNK_ROWS)
+                text.flush()
+                text.detach()  # ✅ Leave closing the member to the ZipFile context
+
+
+def write_csv_export(results, fileobj):
+    """Streams every document into one CSV with a single header row."""
+    text = io.TextIOWrapper(fileobj, encoding="utf-8", newline="")
+    header = True
+    for name, df in results.items():
+        _export_frame(name, df).to_csv(text, index=False, header=header, chunksize=CSV_CHUNK_ROWS)
+        header = False
+    if header:
+        pd.DataFrame(columns=EXPORT_COLUMNS).to_csv(text, index=False)  # ✅ No documents: header only
+    text.flush()
+    text.detach()  # ✅ The caller owns fileobj
+
+
+def _ofx_text(values, limit):
+    """SGML-safe, length-limited OFX element text."""
+    text = pd.Series(values, dtype=object).fillna("").astype(str).str.slice(0, limit).str.strip()
+    return text.str.replace("&", "&amp;", regex=False).str.replace("<", "&lt;", regex=False).str.replace(">", "&gt;", regex=False)
+
+
+def _ofx_amount(cents):
+    """Signed dollars from int64 cents without going through floats."""
+    cents = np.asarray(cents, dtype="int64")
+    sign = np.where(cents < 0, "-", "")
+    whole, frac = np.divmod(np.abs(cents), 100)
+    return [f"{s}{w}.{f:02d}" for s, w, f in zip(sign, whole, frac)]
+
+
+class OfxWriter:
+    """Writes transactions into one OFX 1.02 bank statement as documents arrive.
+
+    Rows are formatted a chunk at a time and written straight to fileobj, so
+    memory does not grow with the run. The statement's start and end dates
+    come first in the file, so they are written as placeholders and patched
+    in on close(); fileobj must be seekable. intu_bid turns the file into a
+    QuickBooks Web Connect (.qbo) file. Rows without a date are skipped and
+    counted in skipped_rows. Every document goes under the one account given
+    here, so a bulk feed should only hold statements of that account.
+    """
+
+    def __init__(self, fileobj, intu_bid=None, bank_id=OFX_BANK_ID, account_id=OFX_ACCOUNT_ID, account_type=OFX_ACCOUNT_TYPE):
+        self.fileobj = fileobj
+        self.rows = 0
+        self.skipped_rows = 0
+        self._first = self._last = None
+        self.account_id = account_id
+        now = time.strftime("%Y%m%d%H%M%S")
+        # ✅ Settings come from the environment; escape them like any other element text
+        org, fid, bid, bank_id, account_id, account_type = _ofx_text([OFX_ORG, intu_bid or bank_id, intu_bid, bank_id, account_id, account_type], 32)
+        fi = f"<FI><ORG>{org}<FID>{fid}</FI>"
+        if intu_bid:
+            fi += f"<INTU.BID>{bid}"
+        self._write(
+            "OFXHEADER:100\r\nDATA:OFXSGML\r\nVERSION:102\r\nSECURITY:NONE\r\nENCODING:USASCII\r\n"
+            "CHARSET:1252\r\nCOMPRESSION:NONE\r\nOLDFILEUID:NONE\r\nNEWFILEUID:NONE\r\n\r\n"
+            f"<OFX><SIGNONMSGSRSV1><SONRS><STATUS><CODE>0<SEVERITY>INFO</STATUS><DTSERVER>{now}<LANGUAGE>ENG{fi}</SONRS></SIGNONMSGSRSV1>\r\n"
+            "<BANKMSGSRSV1><STMTTRNRS><TRNUID>1<STATUS><CODE>0<SEVERITY>INFO</STATUS><STMTRS><CURDEF>USD\r\n"
+            f"<BANKACCTFROM><BANKID>{bank_id}<ACCTID>{account_id}<ACCTTYPE>{account_type}</BANKACCTFROM>\r\n"
+            "<BANKTRANLIST><DTSTART>"
+        )
+        self._start_offset = self.fileobj.tell()
+        self.fileobj.write(OFX_DATE_PLACEHOLDER)
+        self._write("<DTEND>")
+        self._end_offset = self.fileobj.tell()
+        self.fileobj.write(OFX_DATE_PLACEHOLDER)
+        self._write("\r\n")
+
+    def _write(self, text):
+        self.fileobj.write(text.encode("cp1252", errors="replace"))
+
+    def write_document(self, name, df, document_id=None):
+        """Appends one document; document_id (the PDF's content hash) keeps FITIDs of different statements apart."""
+        if document_id is None:
+            # ✅ Without the PDF, identify the statement by its dates and descriptions; corrections don't touch either
+            document_id = hashlib.sha1(pd.util.hash_pandas_object(df[["Date", "Description"]], index=False).to_numpy().tobytes()).hexdigest()
+        # ✅ Nth row with this date and description in the statement; keeps identical rows apart in FITIDs
+        occurrence = df.groupby([df["Date"], df["Description"]], observed=True, sort=False).cumcount().to_numpy()
+        for start in range(0, len(df), CSV_CHUNK_ROWS):
+            self._write_chunk(df.iloc[start:start + CSV_CHUNK_ROWS], document_id, occurrence[start:start + CSV_CHUNK_ROWS])
+
+    def _write_chunk(self, chunk, document_id, occurrence):
+        dated = chunk["Date"].notna().to_numpy()
+        self.skipped_rows += int((~dated).sum())
+        chunk, occurrence = chunk[dated], occurrence[dated]
+        if chunk.empty:
+            return
+        cents = (chunk["Deposits_Credits"] - chunk["Withdrawals_Debits"]).to_numpy(dtype="int64")
+        dates = chunk["Date"].dt.strftime("%Y%m%d")
+        first, last = dates.min(), dates.max()
+        self._first = first if self._first is None else min(self._first, first)
+        self._last = last if self._last is None else max(self._last, last)
+        descriptions = chunk["Description"].astype(str).to_numpy()
+        # ✅ Only statement facts a re-upload or an amount correction can't change, so QuickBooks skips re-imports
+        fit_ids = [
+            hashlib.sha1(f"{self.account_id}|{document_id}|{date}|{description}|{n}".encode("utf-8")).hexdigest()[:24]
+            for date, description, n in zip(dates, descriptions, occurrence)
+        ]
+        names = _ofx_text(chunk["Vendor Name"].astype(str).to_numpy(), 32)
+        memos = _ofx_text(descriptions, 255)
+        lines = [
+            f"<STMTTRN><TRNTYPE>{'CREDIT' if amount >= 0 else 'DEBIT'}<DTPOSTED>{date}<TRNAMT>{text_amount}"
+            f"<FITID>{fit_id}<NAME>{payee}<MEMO>{memo}</STMTTRN>\r\n"
+            for amount, date, text_amount, fit_id, payee, memo in zip(cents, dates, _ofx_amount(cents), fit_ids, names, memos)
+        ]
+        self._write("".join(lines))
+        self.rows += len(lines)
+
+    def close(self):
+        today = time.strftime("%Y%m%d")
+        first, last = self._first or today, self._last or today
+        # ✅ The ledger balance is required but unknown across documents; importers use the transactions
+        self._write(f"</BANKTRANLIST><LEDGERBAL><BALAMT>0.00<DTASOF>{last}</LEDGERBAL></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\r\n")
+        end = self.fileobj.tell()
+        for offset, value in ((self._start_offset, first), (self._end_offset, last)):
+            self.fileobj.seek(offset)
+            self.fileobj.write(value.encode("ascii"))
+        self.fileobj.seek(end)
+
+
+def write_ofx_export(results, fileobj, intu_bid=None, document_ids=None):
+    """Streams every document into one OFX (or, with intu_bid, QBO) bank statement.
+
+    The feed is for a single account (OFX_BANK_ID / OFX_ACCOUNT_ID); export
+    statements of other accounts separately. document_ids maps document
+    names to their PDF content hash for the FITIDs.
+    """
+    writer = OfxWriter(fileobj, intu_bid=intu_bid)
+    for name, df in results.items():
+        writer.write_document(name, df, (document_ids or {}).get(name))
+    writer.close()
+    return writer
+
+
+def write_parquet_export(results, fileobj):
+    """Streams every document into a single Parquet file, one row group per document."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export requires the 'pyarrow' package.")
+
+    schema = pa.schema([
+        ("Date", pa.string()),
+        ("Description", pa.string()),
+        ("Deposits_Credits", pa.float64()),
+        ("Withdrawals_Debits", pa.float64()),
+        ("Vendor Name", pa.string()),
+        ("Document", pa.string()),
+        ("Page", pa.int32()),
+    ])
+    with pq.ParquetWriter(fileobj, schema) as writer:
+        for name, df in results.items():
+            table = pa.Table.from_pandas(_export_frame(name, df), schema=schema, preserve_index=False)
+            writer.write_table(table)
+
+
+def export_to_tempfile(results, export_format, document_ids=None):
+    """Writes the bulk export to a temp file on disk and returns (path, file name, mime type)."""
+    suffix, mime = EXPORT_FORMATS[export_format]
+    handle, path = tempfile.mkstemp(prefix="bulk_export_", suffix=suffix)
+    try:
+        with os.fdopen(handle, "wb") as fileobj:
+            if suffix == ".zip":
+                write_zip_export(results, fileobj)
+            elif suffix == ".csv":
+                write_csv_export(results, fileobj)
+            elif suffix == ".qbo":
+                write_ofx_export(results, fileobj, intu_bid=QBO_INTU_BID, document_ids=document_ids)
+            elif suffix == ".ofx":
+                write_ofx_export(results, fileobj, document_ids=document_ids)
+            else:
+                write_parquet_export(results, fileobj)
+    except Exception:
+        os.remove(path)
+        raise
+    return path, f"bulk_transactions{suffix}", mime
+
+
+def discard_export(export):
+    """Deletes a previously generated export file, if any."""
+    if export and os.path.exists(export[0]):
+        os.remove(export[0])
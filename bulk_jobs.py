@@ -0,0 +1,132 @@
+import threading
+
+from uploads import discard_upload
+from statement_pipeline import process_document
+from document_registry import DocumentRegistry, reusable
+from pipeline_metrics import bind, record_cache
+
+
+class BulkJob:
+    """A bulk batch processed on a background thread, shortest document first.
+
+    Nothing on the thread calls Streamlit (process_document returns its errors
+    in info): progress, errors and finished documents are kept here for the
+    UI to poll with status() and take_finished(), so script reruns caused by
+    widgets neither interrupt nor restart the AI calls.
+    """
+
+    def __init__(self, queue, vendor_list, registry_keys, settings, estimated_pages, run_id, documents, reused=0,
+                 reuse_processed=True):
+        self.vendor_list = vendor_list
+        self.registry_keys = registry_keys
+        self.settings = settings
+        self.estimated_pages = estimated_pages
+        self.run_id = run_id
+        self.reuse_processed = reuse_processed
+        self._queue = sorted(queue, key=lambda upload: estimated_pages.get(upload.name, 0))  # ✅ Shortest job first
+        self._finished = []  # (name, DataFrame, info) not yet picked up by the UI
+        self._progress = {
+            "status": "running", "documents": documents, "reused": reused, "done": 0, "current": None, "page": 0, "pages": 0,
+            "total_pages": max(1, sum(estimated_pages.values())), "processed_pages": 0, "skipped_pages": 0,
+            "tokens_before": 0, "tokens_after": 0, "normalized_pages": 0, "errors": [],
+        }
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="bulk-job", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        """Stops after the document in flight; its pages are finished (and stored if reusable) but not published."""
+        self._cancelled.set()
+        if self._thread.ident is None:
+            self._discard_queue()  # ✅ Never started, nothing else will delete the temp files
+
+    def status(self):
+        with self._lock:
+            return dict(self._progress, errors=list(self._progress["errors"]))
+
+    def take_finished(self):
+        """Finished documents since the last call, oldest first."""
+        with self._lock:
+            finished, self._finished = self._finished, []
+        return finished
+
+    def _update(self, **fields):
+        with self._lock:
+            self._progress.update(fields)
+
+    def _add(self, **counts):
+        with self._lock:
+            for field, count in counts.items():
+                self._progress[field] += count
+
+    def _error(self, *messages):
+        with self._lock:
+            self._progress["errors"].extend(messages)
+
+    def _publish(self, name, df, info):
+        with self._lock:
+            if not self._cancelled.is_set():
+                self._finished.append((name, df, info))
+
+    def _discard_queue(self):
+        for upload in self._queue:
+            discard_upload(upload)
+
+    def _run(self):
+        registry = DocumentRegistry()
+        try:
+            for upload in self._queue:
+                if self._cancelled.is_set():
+                    break
+                self._update(current=upload.name, page=0, pages=self.estimated_pages.get(upload.name, 0))
+                try:
+                    self._process(registry, upload)
+                except Exception as e:
+                    self._error(f"❌ {upload.name}: {e}")
+                finally:
+                    discard_upload(upload)  # ✅ Done with this PDF, the temp file is no longer needed
+                self._add(done=1)
+        finally:
+            self._discard_queue()  # ✅ Whatever a cancel left behind
+            self._update(status="cancelled" if self._cancelled.is_set() else "done", current=None)
+
+    def _process(self, registry, upload):
+        settings = self.settings
+        key = self.registry_keys[upload.name]
+        processed_pages = self._progress["processed_pages"]
+
+        def on_page(index, page_num, info):
+            self._update(page=page_num, pages=info["pages"],
+                         processed_pages=processed_pages + min(len(info["skipped_pages"]) + index, self.estimated_pages.get(upload.name, 0)))
+
+        cached = registry.get(key, document=upload.name) if self.reuse_processed else None  # ✅ Duplicates within the batch
+        with bind(run_id=self.run_id, mode="bulk", document=upload.name):
+            if self.reuse_processed:
+                record_cache("document_registry", cached is not None)
+            if cached is not None:
+                df, info = cached
+            else:
+                df, info = process_document(upload, self.vendor_list, settings["api_key"], settings["ai_model"], document=upload.name,
+                                            skip_pages=settings["skip_pages"], on_page=on_page, tiered=settings["tiered"],
+                                            hedge=settings["hedge"], pdf_engine=settings["pdf_engine"])
+                if df is not None and reusable(info):
+                    registry.put(key, df, info)  # ✅ Failed or unreconciled pages are retried next time
+
+        if cached is not None:
+            self._add(reused=1)
+            self._publish(upload.name, df, info)
+            return
+        # ✅ Progress is measured against the page-tree estimate
+        self._update(processed_pages=processed_pages + self.estimated_pages.get(upload.name, 0))
+        self._error(*(f"❌ {upload.name}: {error}" for error in info["errors"]))
+        if not info["pages"]:
+            self._error(f"❌ Skipping file {upload.name}: Unable to read content.")
+            return
+        self._add(skipped_pages=len(info["skipped_pages"]), tokens_before=info["tokens_before"], tokens_after=info["tokens_after"],
+                  normalized_pages=info["pages"])
+        if df is not None:
+            self._publish(upload.name, df, info)
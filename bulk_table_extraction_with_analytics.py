@@ -2,14 +2,25 @@ import streamlit as st
 import pandas as pd
 import json
 import datetime
-import pdfplumber
-from io import BytesIO
 import requests
-from langchain_google_genai import ChatGoogleGenerativeAI
 import re
 import os
-import plotly.express as px
 import csv
+from transactions import to_display_frame, to_dollars, apply_correction, summarize_amounts, filter_transactions
+from result_store import ResultStore
+from chart_sampling import downsample_frame
+from answer_cache import AnswerCache, answer_key, dataset_fingerprint
+from bulk_export import available_export_formats, export_to_tempfile, discard_export, read_export
+from uploads import spool_upload, discard_upload, count_pdf_pages
+from pdf_backends import available_engines
+from statement_pipeline import DEEPSEEK_API_URL, load_vendor_list, process_document
+from pipeline_metrics import new_run_id, bind, span, record_usage, record_cache, start_metrics_server, load_events, metrics_file_signature
+from document_registry import DocumentRegistry, registry_key, vendor_fingerprint
+from bulk_jobs import BulkJob
+
+GRID_PAGE_SIZES = [25, 50, 100, 250]
+DAILY_CHART_MAX_POINTS = 500  # ✅ Per series; keeps the daily chart's JSON bounded however many days are loaded
+BULK_POLL_SECONDS = 2  # ✅ How often the bulk progress fragment checks the background job
 
 # ✅ Set Streamlit Page Layout
 st.set_page_config(page_title="Transaction Processor and Analytics Agent", page_icon="📄", layout="wide")
@@ -50,29 +61,27 @@ st.sidebar.header("Model Selection")
 ai_model = st.sidebar.radio("Choose AI Model", ["DeepSeek", "Gemini"], horizontal=True, key="ai_model_select")
 
 api_key = st.sidebar.text_input("Enter API Key 🔑 ", type="password")
+fast_model_first = st.sidebar.checkbox("🏎 Fast model first", value=True, help="Send pages to the faster model and escalate to the stronger one only when its answer fails validation")
+hedge_requests = st.sidebar.checkbox("🛡 Hedge slow pages", value=False, help="If a page hasn't come back by the primary model's usual latency, send a duplicate to the other provider and keep the first valid answer")
+hedge = None
+if hedge_requests:
+    secondary_model = "Gemini" if ai_model == "DeepSeek" else "DeepSeek"
+    secondary_api_key = st.sidebar.text_input(f"Secondary API Key ({secondary_model}) 🔑", type="password")
+    hedge_percentile = st.sidebar.slider("Hedge after primary latency percentile", min_value=50, max_value=99, value=90)
+    if secondary_api_key:
+        hedge = {"ai_model": secondary_model, "api_key": secondary_api_key, "percentile": hedge_percentile}
+reuse_processed = st.sidebar.checkbox("♻️ Reuse previously processed statements", value=True, help="Bulk uploads already processed with the same vendor list and settings return their stored transactions instead of being sent again")
+pdf_engine = st.sidebar.selectbox("📑 PDF text engine", available_engines(), help="auto picks the fastest installed engine that keeps pdfplumber's text on each document")
+skip_non_transaction_pages = st.sidebar.checkbox("⚡ Skip non-transaction pages", value=True, help="Skip cover, disclosure and fee schedule pages locally instead of sending them to the AI model")
+
+# ✅ Optional Prometheus endpoint for the pipeline metrics (started once per server process)
+if os.environ.get("PIPELINE_METRICS_PORT"):
+    start_metrics_server(int(os.environ["PIPELINE_METRICS_PORT"]))
 
 # ✅ Tabs for Processing Modes
-tab1, tab2, tab3 = st.tabs(["📄 Single Document Processing", "📂 Bulk Processing", "Analytics Dashboard"])
-
-
-def extract_text_from_pdf(pdf_file):
-    """Extract text from a valid, non-corrupt PDF file."""
-    try:
-        pdf_data = pdf_file.read()
-        pdf_stream = BytesIO(pdf_data)  # ✅ Create a new BytesIO object each time
-
-        text_pages = []
-        with pdfplumber.open(pdf_stream) as pdf:
-            for page_num, page in enumerate(pdf.pages, start=1):
-                text = page.extract_text()
-                if text:
-                    text_pages.append((page_num, text.strip()))
-        return text_pages
-
-    except Exception as e:
-        st.error(f"❌ Error reading PDF: {e}")
-        return []
-    
+tab1, tab2, tab3, tab4 = st.tabs(["📄 Single Document Processing", "📂 Bulk Processing", "Analytics Dashboard", "⚙️ Operations"])
+
+
 def save_qa_log(entry):
     log_file = "qa_history_log.csv"  # ✅ Define log file path
 
@@ -106,98 +115,108 @@ def save_feedback(feedback_entry, filename="feedback_log.csv"):
         writer.writerow(feedback_entry)
 
 
-# ✅ Load Vendor List
-def load_vendor_list(vendor_file):
-    if vendor_file is not None:
-        if vendor_file.name.endswith(".csv"):
-            return pd.read_csv(vendor_file)["Payee"].tolist()
-        else:
-            return pd.read_excel(vendor_file)["Payee"].tolist()
-    return []
-
-# ✅ Process Transactions with AI Model
-def process_and_categorize(text, vendor_list, api_key, ai_model):
-    """Processes transactions and categorizes them in one API call."""
-    prompt = f"""
-    Extract structured transactions from the bank statement and match them to vendors.
-
-    **STRICT RULES:**
-    - Use vendor names **ONLY** from this list:
-      {json.dumps(vendor_list, indent=2)}
-    - Do **NOT** assume vendors. If no match is found, return **"Unknown"**.
-    - Do **NOT** modify transaction descriptions.
-    - Return **pure JSON output** ONLY. No explanations, no additional text.
-
-    **Statement Text:**
-    {text}
-
-    **Output Format (ONLY JSON)**
-    ```json
-    [
-        {{"Date": "MM/DD/YYYY", "Description": "transaction details", "Deposits_Credits": number, "Withdrawals_Debits": number, "Vendor Name": "matched vendor"}},
-        {{"Date": "MM/DD/YYYY", "Description": "another transaction", "Deposits_Credits": number, "Withdrawals_Debits": number, "Vendor Name": "matched vendor"}}
-    ]
-    ```
-
-    **Example:**
-    ```json
-    [
-        {{
-            "Date": "11/01/2023",
-            "Description": "Overdraft Fee for a Transaction Posted on 10/31 $143.00 Dell",
-            "Deposits_Credits": 0,
-            "Withdrawals_Debits": 35.00,
-            "Vendor Name": "Overdraft Fee"
-        }},
-        {{
-            "Date": "11/01/2023",
-            "Description": "ATM Cash Deposit on 11/01 1530 Heitman St Fort Myers FL",
-            "Deposits_Credits": 600.00,
-            "Withdrawals_Debits": 0,
-            "Vendor Name": "ATM"
-        }}
-    ]
-    ```
-    """
+def transactions_csv(df):
+    """CSV bytes for one document's download button."""
+    return to_display_frame(df).to_csv(index=False).encode('utf-8')
 
-    if ai_model == "DeepSeek":
-        payload = {"model": "deepseek-chat", "messages": [{"role": "user", "content": prompt}], "temperature": 0, "stream": False}
-        headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-        response = requests.post("https://api.deepseek.com/v1/chat/completions", headers=headers, json=payload)
 
-        if response.status_code == 200:
-            try:
-                json_data = response.json()["choices"][0]["message"]["content"]
-                return json.loads(json_data.strip("```json").strip("```"))
-            except Exception as e:
-                st.error(f"❌ Error processing DeepSeek response: {e}")
-                return []
-        else:
-            st.error(f"❌ API call failed: {response.status_code} - {response.text}")
-            return []
-
-    elif ai_model == "Gemini":
-        gemini = ChatGoogleGenerativeAI(model="gemini-2.0-pro-exp-02-05", google_api_key=api_key, temperature=0)
-
-        try:
-            response = gemini.invoke(prompt)
-            #Debugging: Show Raw API Response
-            #st.text_area("🔍 Gemini Raw Response", response.content, height=200)
-            if not response or not response.content.strip():
-                st.error("❌ Gemini API returned an empty response.")
-                return []
+@st.cache_data(max_entries=1, show_spinner=False)
+def load_metrics_frame(signature):
+    """Most recent spans as a DataFrame; re-read only when metrics_file_signature() changes."""
+    return pd.DataFrame(load_events(limit=50_000))
 
-            transactions = json.loads(response.content.strip("```json").strip("```"))
 
-            for tx in transactions:
-                tx["Deposits_Credits"] = tx.get("Deposits_Credits", 0) or 0
-                tx["Withdrawals_Debits"] = tx.get("Withdrawals_Debits", 0) or 0
-
-            return transactions
+def show_reconciliation(report):
+    """Shows the running-balance check for one document."""
+    if not report or report["status"] == "unverifiable":
+        st.caption("🧮 Balance check: no opening balance found on the statement, rows were not reconciled.")
+    elif report["status"] == "reconciled":
+        requeried = f" after re-querying page(s) {', '.join(map(str, report['requeried_pages']))}" if report.get("requeried_pages") else ""
+        st.caption(f"🧮 Balance check: rows reconcile with the statement balances{requeried} ✅")
+    else:
+        pages = ", ".join(map(str, report["suspect_pages"])) or "unknown"
+        st.warning(f"⚠️ Balance check: rows are off by ${abs(report['difference']) / 100:,.2f} "
+                   f"({report['failed_checkpoints']} of {report['checkpoints']} daily balances differ). Check page(s): {pages}")
+
+
+def publish_bulk_document(name, df, info):
+    """Makes one finished bulk document available to the feedback, export and analytics views."""
+    st.session_state.bulk_csvs[name] = df
+    st.session_state.bulk_reconciliation[name] = info["reconciliation"]
+    discard_export(st.session_state.get("bulk_export"))  # ✅ An export made earlier no longer covers every document
+    st.session_state.bulk_export = None
+
+
+def collect_bulk_results(job):
+    """Publishes what the background bulk job finished since the last look; returns its status taken before that."""
+    progress = job.status()  # ✅ Read first: once it says done, every document is already in take_finished()
+    finished = job.take_finished()
+    for name, df, info in finished:
+        publish_bulk_document(name, df, info)
+    return progress, bool(finished)
+
+
+@st.fragment(run_every=BULK_POLL_SECONDS)
+def show_bulk_progress(job):
+    """Polls the running bulk job; only this fragment reruns until there is something new for the rest of the page."""
+    progress, published = collect_bulk_results(job)
+    if published or progress["status"] != "running":
+        st.rerun()  # ✅ Full rerun so the views below pick up the new documents; polling stops once the job is done
+    st.progress(min(progress["processed_pages"] / progress["total_pages"], 1.0))
+    if progress["current"]:
+        st.info(f"📄 Processing File {progress['reused'] + progress['done'] + 1}/{progress['documents']} ({progress['current']}) - Page {progress['page']}/{progress['pages']}")
+    ready = len(st.session_state.bulk_csvs)
+    st.caption(f"⏳ {ready} of {progress['documents']} document(s) ready — results below update as each statement finishes")
+
+
+def show_transaction_grid(df, key):
+    """Shows one page of the filtered transactions and returns that slice of df.
+
+    Filtering and paging run here on the server; only the visible rows are
+    sent to the browser.
+    """
+    with st.expander("🔎 Search & Filter", expanded=False):
+        search = st.text_input("Search description or vendor", key=f"{key}_search")
+        col1, col2, col3 = st.columns(3)
+        dates = df["Date"].dropna()
+        date_range = ()
+        if not dates.empty:
+            date_range = col1.date_input("Date range", (dates.min().date(), dates.max().date()), key=f"{key}_dates")
+        vendors = col1.multiselect("Vendors", sorted(df["Vendor Name"].dropna().unique().tolist()), key=f"{key}_vendors")
+        min_amount = col2.number_input("Min amount ($)", value=None, min_value=0.0, step=10.0, key=f"{key}_min_amount")
+        max_amount = col3.number_input("Max amount ($)", value=None, min_value=0.0, step=10.0, key=f"{key}_max_amount")
+    start_date = date_range[0] if len(date_range) > 0 else None
+    end_date = date_range[1] if len(date_range) > 1 else None  # ✅ While picking, date_input briefly holds only a start date
+    filtered = df[filter_transactions(df, search, start_date, end_date, vendors, min_amount, max_amount)]
+
+    col1, col2, col3 = st.columns([1, 1, 3])
+    page_size = col1.selectbox("Rows per page", GRID_PAGE_SIZES, index=1, key=f"{key}_page_size")
+    page_count = max(1, -(-len(filtered) // page_size))
+    if st.session_state.get(f"{key}_page", 1) > page_count:
+        st.session_state[f"{key}_page"] = page_count  # ✅ Filters shrank the result below the current page
+    page = col2.number_input("Page", min_value=1, max_value=page_count, value=1, step=1, key=f"{key}_page")
+    start = (page - 1) * page_size
+    visible = filtered.iloc[start:start + page_size]
+    col3.caption(f"Rows {start + 1 if len(visible) else 0}–{start + len(visible)} of {len(filtered):,}"
+                 + (f" (filtered from {len(df):,})" if len(filtered) != len(df) else ""))
+    st.dataframe(to_display_frame(visible), use_container_width=True)
+    return visible
+
+
+def select_transaction(df, visible_rows, key):
+    """Selectbox over the rows on the current grid page; returns the chosen row index of df or None."""
+    if st.session_state.get(key) not in visible_rows.index:
+        st.session_state.pop(key, None)  # ✅ Paging or filtering moved the previous choice off screen
+
+    def label(index):
+        row = df.loc[index]
+        date = row["Date"].strftime("%m/%d/%Y") if pd.notna(row["Date"]) else ""
+        amount = to_dollars(row["Deposits_Credits"] - row["Withdrawals_Debits"])
+        return f"{date} · {row['Description']} · {'-' if amount < 0 else ''}${abs(amount):,.2f}"
+
+    return st.selectbox("Select a Transaction to Correct", visible_rows.index, format_func=label, key=key,
+                        help="Choose a transaction from the current page; use Search & Filter to find others")
 
-        except Exception as e:
-            st.error(f"❌ Unexpected Gemini API error: {str(e)}")
-            return []
 
 # ✅ Single Document Processing
 with tab1:
@@ -208,35 +227,47 @@ with tab1:
 
     if process_button and pdf_file and vendor_file:
         vendor_list = load_vendor_list(vendor_file)
-        text_pages = extract_text_from_pdf(pdf_file)
-
-        all_transactions = []
         progress_bar = st.progress(0)  # Progress indicator
 
-        for i, (page_num, page_text) in enumerate(text_pages):
-            #st.info(f"📄 Processing Page {page_num} of {len(text_pages)}...")
+        def show_single_progress(index, page_num, info):
             st.info(f"📄 Processing Page {page_num}...")
-            transactions = process_and_categorize(page_text, vendor_list, api_key, ai_model)
-            all_transactions.extend(transactions)
-            progress_bar.progress((i + 1) / len(text_pages))
-
-        if all_transactions:
-            st.session_state.transactions = pd.DataFrame(all_transactions)
+            progress_bar.progress(index / max(info["sent_pages"], 1))
+
+        single_run_id = new_run_id()
+        with bind(run_id=single_run_id, mode="single", document=pdf_file.name):
+            df_single, info = process_document(pdf_file, vendor_list, api_key, ai_model, skip_pages=skip_non_transaction_pages,
+                                               on_page=show_single_progress, tiered=fast_model_first, hedge=hedge,
+                                               pdf_engine=pdf_engine)
+        progress_bar.progress(1.0)
+        for error in info["errors"]:
+            st.error(f"❌ {error}")
+
+        if info["pages"]:
+            st.caption(f"✂️ Normalized page text: ~{info['tokens_before'] // info['pages']} → ~{info['tokens_after'] // info['pages']} input tokens per page")
+        if info["skipped_pages"]:
+            skipped_pages = info["skipped_pages"]
+            st.caption(f"⚡ Skipped {len(skipped_pages)} non-transaction page(s): {', '.join(str(num) for num, _ in skipped_pages)} — {len(skipped_pages)} AI call(s) avoided")
+
+        if df_single is not None:
+            st.session_state.transactions, st.session_state.transactions_reconciliation = df_single, info["reconciliation"]
+            st.session_state.transactions_run_id = single_run_id  # ✅ Fresh grid filters for each processed document
             st.success("✅ Transactions extracted & categorized successfully!")
 
     # ✅ Show feedback & download ONLY in Single Document Processing tab
     if "transactions" in st.session_state and not st.session_state.transactions.empty:
         df = st.session_state.transactions
         st.markdown("<h4 style='color: #1976D2; font-weight: bold;'>📋 Processed Transactions</h4>", unsafe_allow_html=True)
-        st.dataframe(df, use_container_width=True)
+        show_reconciliation(st.session_state.get("transactions_reconciliation"))
+        visible_rows = show_transaction_grid(df, f"single_grid_{st.session_state.get('transactions_run_id', '')}")
 
         st.markdown("<h5 style='color: #444;'>📝 Provide Feedback</h5>", unsafe_allow_html=True)
 
-        # ✅ Step 1: Select a transaction to correct
-        selected_desc = st.selectbox("Select a Transaction to Correct", df["Description"].unique(), key="single_desc", help="Choose a transaction from the list")
+        # ✅ Step 1: Select a transaction to correct (from the rows on the current page)
+        selected_index = select_transaction(df, visible_rows, "single_desc")
 
-        if not df[df["Description"] == selected_desc].empty:
-            filtered_row = df[df["Description"] == selected_desc].iloc[0]
+        if selected_index is not None:
+            filtered_row = df.loc[selected_index]
+            selected_desc = filtered_row["Description"]
 
             # ✅ Vendor Selection (Dropdown + Freeflow Text)
             existing_vendors = df["Vendor Name"].dropna().unique().tolist()  # Get unique vendor names
@@ -249,16 +280,16 @@ with tab1:
             # ✅ Determine final vendor choice
             correct_vendor = new_vendor_text.strip() if new_vendor_text.strip() else selected_vendor_dropdown
 
-            correct_deposits = st.number_input("Deposits_Credits", value=float(filtered_row["Deposits_Credits"]), step=0.01, key="single_deposit_fb", help="Update deposit amount if incorrect")
-            correct_withdrawals = st.number_input("Withdrawals_Debits", value=float(filtered_row["Withdrawals_Debits"]), step=0.01, key="single_withdraw_fb", help="Update withdrawal amount if incorrect")
+            correct_deposits = st.number_input("Deposits_Credits", value=to_dollars(filtered_row["Deposits_Credits"]), step=0.01, key="single_deposit_fb", help="Update deposit amount if incorrect")
+            correct_withdrawals = st.number_input("Withdrawals_Debits", value=to_dollars(filtered_row["Withdrawals_Debits"]), step=0.01, key="single_withdraw_fb", help="Update withdrawal amount if incorrect")
             comments = st.text_area("Additional Comments (Optional)", key="single_comments_fb", help="Provide any additional feedback")
 
             col1, col2 = st.columns([1, 1.2])
             with col1:
                 submit_feedback = st.button("✅ Submit Feedback", key="single_feedback_btn", help="Submit your feedback")
             with col2:
-                csv_data = df.to_csv(index=False).encode('utf-8')
-                st.download_button("⬇ Download CSV", csv_data, "transactions.csv", "text/csv", help="Download the updated transactions")
+                # ✅ Serialized only when the button is clicked, not on every rerun
+                st.download_button("⬇ Download CSV", lambda: transactions_csv(df), "transactions.csv", "text/csv", help="Download the updated transactions")
 
             if submit_feedback:
                 # ✅ Capture feedback details
@@ -275,16 +306,9 @@ with tab1:
                 save_feedback(feedback_entry)  # ✅ Save to feedback log
 
                 # ✅ Update transaction DataFrame
-                df.loc[df["Description"] == selected_desc, ["Vendor Name", "Deposits_Credits", "Withdrawals_Debits"]] = [
-                    correct_vendor, 
-                    float(correct_deposits), 
-                    float(correct_withdrawals)
-                ]
+                apply_correction(df, df.index == selected_index, correct_vendor, correct_deposits, correct_withdrawals)
 
                 st.session_state.transactions = df  # ✅ Update session state
-                
-                # ✅ Generate updated CSV
-                csv_data = df.to_csv(index=False).encode('utf-8')
 
                 st.success("✅ Feedback submitted successfully!")
 
@@ -304,58 +328,102 @@ with tab2:
     process_bulk_button = st.button("🚀 Process Bulk Documents", key="bulk_process")
 
     if process_bulk_button and uploaded_folder and vendor_file:
+        if st.session_state.get("bulk_job"):
+            st.session_state.bulk_job.cancel()  # ✅ A new batch replaces any unfinished one
         vendor_list = load_vendor_list(vendor_file)
-        progress_bar = st.progress(0)
-
-        total_pages = sum(len(extract_text_from_pdf(BytesIO(pdf_file.getvalue()))) for pdf_file in uploaded_folder)
-        processed_pages = 0
-
-        session_bulk_csvs = {}  # ✅ Store separate DataFrames per PDF
-
-        for pdf_idx, pdf_file in enumerate(uploaded_folder):
-            pdf_data = pdf_file.getvalue()  # ✅ Read once into memory
-            text_pages = extract_text_from_pdf(BytesIO(pdf_data))  # ✅ Use BytesIO(pdf_data)
-
-            if not text_pages:
-                st.error(f"❌ Skipping file {pdf_file.name}: Unable to read content.")
-                continue  # ✅ Skip unreadable PDFs
-
-            file_name = pdf_file.name  # ✅ Store filename
-            transactions_per_pdf = []  # ✅ Store transactions for this PDF only
-
-            for i, (page_num, page_text) in enumerate(text_pages):
-                st.info(f"📄 Processing File {pdf_idx + 1}/{len(uploaded_folder)} - Page {page_num}/{len(text_pages)}")
-                transactions = process_and_categorize(page_text, vendor_list, api_key, ai_model)
 
-                # ✅ Add filename to each transaction
-                for txn in transactions:
-                    txn["Document"] = file_name
+        # ✅ Spool every upload to disk once; everything below works from the temp file path
+        spooled_uploads = [spool_upload(pdf_file) for pdf_file in uploaded_folder]
 
-                transactions_per_pdf.extend(transactions)
-                processed_pages += 1
-                progress_bar.progress(processed_pages / total_pages)
-
-            if transactions_per_pdf:
-                session_bulk_csvs[file_name] = pd.DataFrame(transactions_per_pdf)  # ✅ Save per file
-
-        # ✅ Store in session state
-        st.session_state.bulk_csvs = session_bulk_csvs
+        # ✅ Statements seen before (same content hash, vendor list and settings) skip the pipeline
+        registry = DocumentRegistry()
+        vendor_fp = vendor_fingerprint(vendor_list)
+        registry_keys = {
+            upload.name: registry_key(upload.sha256, vendor_fp, ai_model, tiered=fast_model_first, skip_pages=skip_non_transaction_pages,
+                                      pdf_engine=pdf_engine)
+            for upload in spooled_uploads
+        }
+        bulk_run_id = new_run_id()  # ✅ Groups this batch's metrics
+        st.session_state.bulk_csvs = ResultStore()  # ✅ Store separate DataFrames per PDF (LRU in memory, rest on disk)
+        st.session_state.bulk_reconciliation = {}  # ✅ Balance check report per PDF
+        st.session_state.bulk_document_ids = {upload.name: upload.sha256 for upload in spooled_uploads}  # ✅ Keeps bank feed FITIDs per statement
+        discard_export(st.session_state.get("bulk_export"))  # ✅ Previous export is stale now
+        st.session_state.bulk_export = None
+
+        pending, reused_count = [], 0
+        for upload in spooled_uploads:
+            cached = registry.get(registry_keys[upload.name], document=upload.name) if reuse_processed else None
+            if cached is None:
+                pending.append(upload)
+                continue
+            with bind(run_id=bulk_run_id, mode="bulk", document=upload.name):
+                record_cache("document_registry", True)
+            publish_bulk_document(upload.name, *cached)  # ✅ Known statements are available immediately
+            reused_count += 1
+            discard_upload(upload)
+
+        estimated_pages = {upload.name: count_pdf_pages(upload) for upload in pending}  # ✅ Page tree only, no text extraction
+        # ✅ Runs on its own thread so widget reruns can't interrupt or repeat paid AI calls
+        st.session_state.bulk_job = BulkJob(
+            pending, vendor_list, registry_keys,
+            {"api_key": api_key, "ai_model": ai_model, "skip_pages": skip_non_transaction_pages, "tiered": fast_model_first,
+             "hedge": hedge, "pdf_engine": pdf_engine},
+            estimated_pages, bulk_run_id, len(spooled_uploads), reused=reused_count, reuse_processed=reuse_processed,
+        ).start()
+
+    bulk_job = st.session_state.get("bulk_job")
+    bulk_progress = collect_bulk_results(bulk_job)[0] if bulk_job else None
+    for error in (bulk_progress or {}).get("errors", []):
+        st.error(error)
+    if bulk_progress and bulk_progress["status"] == "running":
+        show_bulk_progress(bulk_job)
+    elif bulk_progress and bulk_progress["status"] == "done":
         st.success("✅ Bulk Transactions Processed! Each PDF has its own CSV.")
+        if bulk_progress["reused"]:
+            st.caption(f"♻️ {bulk_progress['reused']} of {bulk_progress['documents']} document(s) reused from earlier runs — only new or changed statements were processed")
+        if bulk_progress["normalized_pages"]:
+            st.caption(f"✂️ Normalized page text: ~{bulk_progress['tokens_before'] // bulk_progress['normalized_pages']} → ~{bulk_progress['tokens_after'] // bulk_progress['normalized_pages']} input tokens per page")
+        if bulk_job.settings["skip_pages"]:
+            st.caption(f"⚡ Page triage skipped {bulk_progress['skipped_pages']} non-transaction page(s) this run — {bulk_progress['skipped_pages']} AI call(s) avoided")
 
     # ✅ Show feedback & download per document
     if "bulk_csvs" in st.session_state and st.session_state.bulk_csvs:
+        # ✅ One-click export of every processed document (generated only on request)
+        st.markdown("<h5 style='color: #444;'>📦 Export All Documents</h5>", unsafe_allow_html=True)
+        export_col1, export_col2 = st.columns([1, 1.2])
+        with export_col1:
+            export_format = st.selectbox("Export Format", available_export_formats(), key="bulk_export_format")
+            prepare_export = st.button("📦 Prepare Export", key="bulk_export_btn")
+
+        if prepare_export:
+            discard_export(st.session_state.get("bulk_export"))
+            st.session_state.bulk_export = None
+            try:
+                with st.spinner("⏳ Writing export file..."):
+                    st.session_state.bulk_export = export_to_tempfile(st.session_state.bulk_csvs, export_format,
+                                                                      st.session_state.get("bulk_document_ids"))
+            except Exception as e:
+                st.error(f"❌ Export failed: {e}")
+
+        bulk_export = st.session_state.get("bulk_export")
+        if bulk_export and os.path.exists(bulk_export[0]):
+            with export_col2:
+                st.download_button(f"⬇ Download {bulk_export[1]}", lambda: read_export(bulk_export), bulk_export[1], bulk_export[2], key="bulk_export_download")
+
         selected_doc = st.selectbox("📂 Select a Document for Feedback", list(st.session_state.bulk_csvs.keys()), key="bulk_doc")
         df_selected = st.session_state.bulk_csvs[selected_doc]
 
         st.markdown(f"<h4 style='color: #1976D2; font-weight: bold;'>📋 Processed Transactions - {selected_doc}</h4>", unsafe_allow_html=True)
-        st.dataframe(df_selected, use_container_width=True)
+        show_reconciliation(st.session_state.get("bulk_reconciliation", {}).get(selected_doc))
+        visible_rows = show_transaction_grid(df_selected, f"bulk_grid_{selected_doc}")  # ✅ Filters are kept per document
 
         st.markdown("<h5 style='color: #444;'>📝 Provide Feedback</h5>", unsafe_allow_html=True)
 
-        selected_desc = st.selectbox("Select a Transaction to Correct", df_selected["Description"].unique(), key="bulk_desc")
+        selected_index = select_transaction(df_selected, visible_rows, "bulk_desc")
 
-        if not df_selected[df_selected["Description"] == selected_desc].empty:
-            filtered_row = df_selected[df_selected["Description"] == selected_desc].iloc[0]
+        if selected_index is not None:
+            filtered_row = df_selected.loc[selected_index]
+            selected_desc = filtered_row["Description"]
 
             # ✅ Vendor Selection (Dropdown + Freeflow Text)
             existing_vendors = df_selected["Vendor Name"].dropna().unique().tolist()
@@ -368,16 +436,15 @@ with tab2:
             new_vendor_text = st.text_input("Or Enter a New Vendor Name", "", key="bulk_vendor_text")
 
             correct_vendor = new_vendor_text.strip() if new_vendor_text.strip() else selected_vendor_dropdown
-            correct_deposits = st.number_input("Deposits_Credits", value=float(filtered_row["Deposits_Credits"]), step=0.01, key="bulk_deposit_fb")
-            correct_withdrawals = st.number_input("Withdrawals_Debits", value=float(filtered_row["Withdrawals_Debits"]), step=0.01, key="bulk_withdraw_fb")
+            correct_deposits = st.number_input("Deposits_Credits", value=to_dollars(filtered_row["Deposits_Credits"]), step=0.01, key="bulk_deposit_fb")
+            correct_withdrawals = st.number_input("Withdrawals_Debits", value=to_dollars(filtered_row["Withdrawals_Debits"]), step=0.01, key="bulk_withdraw_fb")
             comments = st.text_area("Additional Comments (Optional)", key="bulk_comments_fb")
 
             col1, col2 = st.columns([1, 1.2])
             with col1:
                 submit_feedback = st.button("✅ Submit Feedback", key="bulk_feedback_btn")
             with col2:
-                csv_data = df_selected.to_csv(index=False).encode('utf-8')
-                st.download_button(f"⬇ Download {selected_doc} CSV", csv_data, f"{selected_doc}.csv", "text/csv")
+                st.download_button(f"⬇ Download {selected_doc} CSV", lambda: transactions_csv(df_selected), f"{selected_doc}.csv", "text/csv")
 
             if submit_feedback:
                 feedback_entry = [[
@@ -387,19 +454,16 @@ with tab2:
                 
                 save_feedback(feedback_entry)  # ✅ Save to feedback log
 
-                df_selected.loc[df_selected["Description"] == selected_desc, ["Vendor Name", "Deposits_Credits", "Withdrawals_Debits"]] = [
-                    correct_vendor, float(correct_deposits), float(correct_withdrawals)
-                ]
-
-                st.session_state.bulk_csvs[selected_doc] = df_selected  # ✅ Update session state
+                apply_correction(df_selected, df_selected.index == selected_index, correct_vendor, correct_deposits, correct_withdrawals)
 
-                # ✅ Generate updated CSV
-                csv_data = df_selected.to_csv(index=False).encode('utf-8')
+                st.session_state.bulk_csvs[selected_doc] = df_selected  # ✅ Corrections stay in this session, never in the shared registry
+                discard_export(st.session_state.get("bulk_export"))  # ✅ Export no longer matches the data
+                st.session_state.bulk_export = None
 
                 st.success("✅ Feedback submitted successfully!")
 
                 # ✅ Show updated download button
-                st.download_button(f"⬇ Download Updated {selected_doc} CSV", csv_data, f"{selected_doc}.csv", "text/csv")
+                st.download_button(f"⬇ Download Updated {selected_doc} CSV", lambda: transactions_csv(df_selected), f"{selected_doc}.csv", "text/csv")
 
 # ✅ Ensure session state for Q&A history
 if "qa_history" not in st.session_state:
@@ -407,49 +471,62 @@ if "qa_history" not in st.session_state:
 
 # ✅ Ensure session state for storing bulk CSVs
 if "bulk_csvs" not in st.session_state:
-    st.session_state.bulk_csvs = {}
+    st.session_state.bulk_csvs = ResultStore()
 
 # ✅ Analytics Dashboard (Supports Multiple CSVs)
 with tab3:
     st.markdown("<h2 style='color:#004AAD;'>📊 AI Analytics Dashboard</h2>", unsafe_allow_html=True)
 
-    # ✅ Gather available CSVs
-    available_csvs = {}
+    # ✅ Gather available CSVs (names only, bulk documents load lazily when selected)
+    available_csvs = []
 
     if "transactions" in st.session_state and not st.session_state.transactions.empty:
-        available_csvs["Single Document"] = st.session_state.transactions
+        available_csvs.append("Single Document")
 
     if "bulk_csvs" in st.session_state and st.session_state.bulk_csvs:
-        available_csvs.update(st.session_state.bulk_csvs)  # ✅ Add bulk CSVs
+        available_csvs.extend(st.session_state.bulk_csvs.keys())  # ✅ Add bulk CSVs
 
     # ✅ No CSVs available
     if not available_csvs:
         st.warning("⚠ No transactions available. Process a document first.")
     else:
+        import plotly.express as px  # ✅ Charting stack loads only when there is data to chart
+
         # ✅ Select CSV for analysis
-        selected_csv = st.selectbox("📂 Select CSV for Analysis", list(available_csvs.keys()), key="analytics_csv")
-        df = available_csvs[selected_csv]
+        selected_csv = st.selectbox("📂 Select CSV for Analysis", available_csvs, key="analytics_csv")
+        if selected_csv == "Single Document" and "transactions" in st.session_state:
+            df = st.session_state.transactions
+        else:
+            df = st.session_state.bulk_csvs[selected_csv]
 
-        # ✅ Ensure valid dates before conversion
-        df["Date"] = pd.to_datetime(df["Date"], format="%m/%d/%Y", errors="coerce")
+        # ✅ Dates are already datetime64 after normalization
         df = df.dropna(subset=["Date"])  # ✅ Remove invalid dates
 
         # ✅ Transactions Over Time (Month-wise)
         st.markdown(f"<h4 style='color:#1976D2;'>📊 Transactions Over Time (Monthly) - {selected_csv}</h4>", unsafe_allow_html=True)
-        df_grouped = df.groupby(df["Date"].dt.to_period("M"))[["Deposits_Credits", "Withdrawals_Debits"]].sum().reset_index()
+        df_grouped = summarize_amounts(df, df["Date"].dt.to_period("M"))
         df_grouped["Date"] = df_grouped["Date"].astype(str)
         fig = px.line(df_grouped, x="Date", y=["Deposits_Credits", "Withdrawals_Debits"], title="Transactions Over Time (Monthly)")
         st.plotly_chart(fig, use_container_width=True)
 
         # ✅ Transactions Over Time (Day-wise)
         st.markdown(f"<h4 style='color:#1976D2;'>📆 Transactions Over Time (Daily) - {selected_csv}</h4>", unsafe_allow_html=True)
-        df_grouped_day = df.groupby(df["Date"])[["Deposits_Credits", "Withdrawals_Debits"]].sum().reset_index()
-        fig_day = px.line(df_grouped_day, x="Date", y=["Deposits_Credits", "Withdrawals_Debits"], title="Transactions Over Time (Daily)")
+        df_grouped_day = summarize_amounts(df, "Date")
+        if len(df_grouped_day) > 1:
+            first_day, last_day = df_grouped_day["Date"].iloc[0].date(), df_grouped_day["Date"].iloc[-1].date()
+            zoom_start, zoom_end = st.slider("Date range", min_value=first_day, max_value=last_day, value=(first_day, last_day),
+                                             format="MM/DD/YYYY", key=f"daily_zoom_{selected_csv}")
+            # ✅ Zoom on the server, then keep at most DAILY_CHART_MAX_POINTS shape-preserving points per series
+            df_grouped_day = df_grouped_day[df_grouped_day["Date"].between(pd.Timestamp(zoom_start), pd.Timestamp(zoom_end))]
+        df_chart_day = downsample_frame(df_grouped_day, "Date", ["Deposits_Credits", "Withdrawals_Debits"], DAILY_CHART_MAX_POINTS)
+        if len(df_chart_day) < len(df_grouped_day):
+            st.caption(f"📉 Showing {len(df_chart_day):,} of {len(df_grouped_day):,} days (downsampled, peaks kept). Narrow the date range for full detail.")
+        fig_day = px.line(df_chart_day, x="Date", y=["Deposits_Credits", "Withdrawals_Debits"], title="Transactions Over Time (Daily)")
         st.plotly_chart(fig_day, use_container_width=True)
 
         # ✅ Vendor-Based Summary
         st.markdown("<h4 style='color:#1976D2;'>📌 Vendor-Based Summary</h4>", unsafe_allow_html=True)
-        vendor_summary = df.groupby("Vendor Name")[["Deposits_Credits", "Withdrawals_Debits"]].sum().reset_index()
+        vendor_summary = summarize_amounts(df, "Vendor Name")
         fig_bar = px.bar(vendor_summary, x="Vendor Name", y=["Deposits_Credits", "Withdrawals_Debits"], title="Top Vendors by Transactions", barmode="group")
         st.plotly_chart(fig_bar, use_container_width=True)
 
@@ -512,34 +589,58 @@ with tab3:
         if ask_button and query.strip():
             st.markdown('<div class="chat-container">', unsafe_allow_html=True)
 
-            context = f"Analyze the following transaction data:\n{df.to_json(orient='records', indent=2)}"
-            full_prompt = f"""
-            {context}
-            User Question: {query}
-
-            **Instructions for Response Formatting:**
-            - **Provide clear, structured financial insights.**
-            - **Summarize key findings concisely.**
-            - **Use structured tables for numerical analysis where possible.**
-            - **If needed, return JSON Table format for structured display.**
-            """
+            if "answer_cache" not in st.session_state:
+                st.session_state.answer_cache = AnswerCache()
+            # ✅ Same question on unchanged data and model: reuse the answer; feedback edits change the fingerprint
+            cache_key = answer_key(query, dataset_fingerprint(df), ai_model)
+            response_text = st.session_state.answer_cache.get(cache_key)
+            record_cache("insights_answers", response_text is not None, document=selected_csv)
+            cache_answer = False
+
+            if response_text is None:  # ✅ Only serialize the dataset when the model will actually be called
+                context = f"Analyze the following transaction data:\n{to_display_frame(df).to_json(orient='records', indent=2)}"
+                full_prompt = f"""
+                {context}
+                User Question: {query}
+
+                **Instructions for Response Formatting:**
+                - **Provide clear, structured financial insights.**
+                - **Summarize key findings concisely.**
+                - **Use structured tables for numerical analysis where possible.**
+                - **If needed, return JSON Table format for structured display.**
+                """
 
             try:
-                if ai_model == "DeepSeek":
+                if response_text is not None:
+                    st.caption("♻️ Answer reused: same question on the same data, no AI call made")
+                elif ai_model == "DeepSeek":
                     payload = {"model": "deepseek-chat", "messages": [{"role": "user", "content": full_prompt}], "temperature": 0}
                     headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-                    response = requests.post("https://api.deepseek.com/v1/chat/completions", headers=headers, json=payload)
+                    with span("insights", provider=ai_model, model="deepseek-chat") as event:
+                        response = requests.post(DEEPSEEK_API_URL, headers=headers, json=payload)
+                        event["status"] = response.status_code
+                        if response.status_code == 200:
+                            record_usage(event, response.json().get("usage"))
 
                     if response.status_code == 200:
                         response_text = response.json()["choices"][0]["message"]["content"]
+                        cache_answer = True
                     else:
                         st.error(f"❌ DeepSeek API error: {response.status_code}")
                         response_text = "Error fetching response from DeepSeek."
 
                 elif ai_model == "Gemini":
+                    from langchain_google_genai import ChatGoogleGenerativeAI  # ✅ Imported on first Gemini call
+
                     gemini = ChatGoogleGenerativeAI(model="gemini-2.0-pro-exp-02-05", google_api_key=api_key, temperature=0)
-                    response = gemini.invoke(full_prompt)
+                    with span("insights", provider=ai_model, model="gemini-2.0-pro-exp-02-05") as event:
+                        response = gemini.invoke(full_prompt)
+                        record_usage(event, getattr(response, "usage_metadata", None))
                     response_text = response.content if response else "No response received."
+                    cache_answer = bool(response)
+
+                if cache_answer:
+                    st.session_state.answer_cache.put(cache_key, response_text, question=query, document=selected_csv)
 
                 # ✅ Detect if response contains JSON table
                 if response_text.strip().startswith("{") or response_text.strip().startswith("["):
@@ -580,3 +681,94 @@ with tab3:
                 st.dataframe(qa_df, use_container_width=True)
             else:
                 st.info("📝 No Q&A history yet. Ask a question to start logging interactions!")
+
+
+# ✅ Operations Dashboard (throughput, latency, tokens and cache use per processing run)
+with tab4:
+    st.markdown("<h2 style='color:#004AAD;'>⚙️ Performance & Cost</h2>", unsafe_allow_html=True)
+
+    events = load_metrics_frame(metrics_file_signature())  # ✅ Most recent spans, parsed again only after new events
+    if events.empty or "run_id" not in events.columns or events["run_id"].dropna().empty:
+        st.info("📝 No pipeline metrics recorded yet. Process a document first.")
+    else:
+        import plotly.express as px  # ✅ Charting stack loads only when there are metrics to chart
+
+        for column in ["mode", "provider", "document", "page", "pages", "prompt_tokens", "completion_tokens", "cached_prompt_tokens", "status", "error", "cache", "hit", "hedged", "winner"]:
+            if column not in events.columns:
+                events[column] = None
+
+        run_starts = events.dropna(subset=["run_id"]).groupby("run_id")["ts"].min().sort_values(ascending=False)
+        run_labels = {run_id: f"{run_id} ({events.loc[events['run_id'] == run_id, 'mode'].iloc[0]})" for run_id in run_starts.index}
+        selected_run = st.selectbox("🗂 Select Processing Run", list(run_starts.index), format_func=run_labels.get, key="ops_run")
+        run_events = events[events["run_id"] == selected_run]
+
+        documents = run_events[run_events["stage"] == "document"]
+        provider_calls = run_events[run_events["stage"] == "provider"]
+        wall_seconds = max((run_events["ts"] + run_events["latency_ms"] / 1000).max() - run_events["ts"].min(), 1e-9)
+        pages = int(documents["pages"].fillna(0).sum()) if "pages" in documents.columns else 0
+        failed_calls = int((provider_calls["error"].notna() | (provider_calls["status"].fillna(200) != 200)).sum())
+
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Documents", len(documents))
+        col2.metric("Pages / sec", f"{pages / wall_seconds:.2f}")
+        col3.metric("AI calls", len(provider_calls), delta=f"{failed_calls} failed" if failed_calls else None, delta_color="inverse")
+        col4.metric("Wall time", f"{wall_seconds:.1f} s")
+        if "escalate" in run_events.columns:
+            escalations = int(run_events["escalate"].fillna(False).astype(bool).sum())
+            st.caption(f"🏎 {escalations} page(s) escalated from the fast model to the stronger model")
+        hedges = run_events[run_events["stage"] == "hedge"]
+        if not hedges.empty:
+            hedged = hedges[hedges["hedged"].fillna(False).astype(bool)]  # ✅ Unset when the hedge span failed early
+            secondary_wins = int((hedged["winner"] != hedged["provider"]).sum())
+            st.caption(f"🛡 {len(hedged)} of {len(hedges)} page(s) hedged to the secondary provider, which answered first {secondary_wins} time(s)")
+
+        # ✅ Per-provider latency histogram
+        st.markdown("<h4 style='color:#1976D2;'>⏱ AI Call Latency</h4>", unsafe_allow_html=True)
+        if provider_calls.empty:
+            st.info("No AI calls in this run.")
+        else:
+            latency = provider_calls.assign(seconds=provider_calls["latency_ms"] / 1000)
+            fig_latency = px.histogram(latency, x="seconds", color="provider", nbins=40, barmode="overlay", title="AI Call Latency (seconds)")
+            st.plotly_chart(fig_latency, use_container_width=True)
+            percentiles = latency.groupby("provider")["seconds"].quantile([0.5, 0.95, 0.99]).unstack()
+            percentiles.columns = ["p50 (s)", "p95 (s)", "p99 (s)"]
+            st.dataframe(percentiles.round(2), use_container_width=True)
+
+        # ✅ Token spend and provider-side prompt caching
+        st.markdown("<h4 style='color:#1976D2;'>🪙 Token Spend</h4>", unsafe_allow_html=True)
+        token_columns = ["prompt_tokens", "completion_tokens", "cached_prompt_tokens"]
+        token_events = run_events[run_events["stage"].isin(["provider", "insights"])]
+        tokens = token_events.groupby("provider")[token_columns].sum(min_count=1).fillna(0).astype("int64")
+        if tokens.empty:
+            st.info("No token usage reported in this run.")
+        else:
+            tokens["tokens per page"] = ((tokens["prompt_tokens"] + tokens["completion_tokens"]) / max(pages, 1)).round(1)
+            st.dataframe(tokens, use_container_width=True)
+
+        # ✅ Cache hit ratio
+        cache_events = run_events[run_events["stage"] == "cache"]
+        prompt_tokens = tokens["prompt_tokens"].sum() if not tokens.empty else 0
+        col1, col2 = st.columns(2)
+        if cache_events.empty:
+            col1.metric("Cache hit ratio", "—")
+        else:
+            col1.metric("Cache hit ratio", f"{cache_events['hit'].astype(bool).mean():.0%}", help=", ".join(cache_events["cache"].dropna().unique()))
+        col2.metric("Prompt tokens served from provider cache",
+                    f"{tokens['cached_prompt_tokens'].sum() / prompt_tokens:.0%}" if prompt_tokens else "—")
+
+        # ✅ Slowest documents and pages
+        st.markdown("<h4 style='color:#1976D2;'>🐢 Slowest Documents & Pages</h4>", unsafe_allow_html=True)
+        col1, col2 = st.columns(2)
+        with col1:
+            slowest_documents = documents.assign(seconds=documents["latency_ms"] / 1000).nlargest(10, "seconds")
+            st.dataframe(slowest_documents[["document", "pages", "seconds"]].round(2), use_container_width=True, hide_index=True)
+        with col2:
+            page_events = run_events.dropna(subset=["page"])
+            # ✅ Outer spans only: provider, parse and validate run inside categorize, and categorize inside hedge
+            stage_ms = page_events.pivot_table(index=["document", "page"], columns="stage", values="latency_ms", aggfunc="sum", fill_value=0)
+            stage_ms = stage_ms.reindex(columns=["prompt", "categorize", "hedge"], fill_value=0)
+            page_ms = stage_ms["prompt"] + stage_ms["hedge"].where(stage_ms["hedge"] > 0, stage_ms["categorize"])
+            slowest_pages = (page_ms / 1000).nlargest(10)
+            slowest_pages = slowest_pages.rename("seconds").reset_index()
+            slowest_pages["page"] = slowest_pages["page"].astype(int)
+            st.dataframe(slowest_pages.round(2), use_container_width=True, hide_index=True)
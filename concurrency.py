@@ -0,0 +1,69 @@
+import hashlib
+import os
+import threading
+import time
+
+
+MAX_CONCURRENCY = int(os.environ.get("PIPELINE_MAX_CONCURRENCY", "8"))
+INITIAL_CONCURRENCY = 2
+MAX_BACKOFF_SECONDS = 30.0
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+class AdaptiveLimiter:
+    """AIMD limit on in-flight requests for one provider and API key.
+
+    Every healthy response widens the limit by about one slot per round of
+    requests; a 429/5xx, timeout or dropped connection halves it. Latency
+    alone is not a signal: LLM calls take longer the more rows they return.
+    A Retry-After (or an exponential backoff when the provider sends none)
+    pauses new requests.
+    """
+
+    def __init__(self, initial=INITIAL_CONCURRENCY, minimum=1, maximum=MAX_CONCURRENCY, decrease=0.5):
+        self.minimum = minimum
+        self.maximum = max(maximum, minimum)
+        self.decrease = decrease
+        self.limit = float(min(max(initial, minimum), self.maximum))
+        self.in_flight = 0
+        self._blocked_until = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while True:
+                wait_for = self._blocked_until - time.monotonic()
+                if wait_for <= 0 and self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                self._condition.wait(timeout=wait_for if wait_for > 0 else None)
+
+    def release(self, ok, retry_after=None):
+        """Returns a slot; ok=False means the provider throttled, timed out or failed the request."""
+        with self._condition:
+            self.in_flight -= 1
+            if not ok:
+                self.limit = max(self.minimum, self.limit * self.decrease)
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+            self._condition.notify_all()
+
+
+def limiter_for(provider, api_key):
+    """Returns the shared limiter for a provider and API key (the key is only kept as a hash)."""
+    key = (provider, hashlib.sha256((api_key or "").encode()).hexdigest()[:16])
+    with _limiters_lock:
+        if key not in _limiters:
+            _limiters[key] = AdaptiveLimiter()
+        return _limiters[key]
+
+
+def backoff_seconds(retry, retry_after=None):
+    """Retry-After when the provider sent one, otherwise 1s, 2s, 4s ... capped at MAX_BACKOFF_SECONDS."""
+    if retry_after:
+        return min(float(retry_after), MAX_BACKOFF_SECONDS)
+    return min(2.0 ** retry, MAX_BACKOFF_SECONDS)
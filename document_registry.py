@@ -0,0 +1,77 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+
+REGISTRY_DIR = os.environ.get("DOCUMENT_REGISTRY_DIR", os.path.join(os.path.expanduser("~"), ".cache", "table_extraction", "documents"))
+REGISTRY_VERSION = 2  # ✅ Bump when process_document output changes so old entries are not reused
+
+
+def vendor_fingerprint(vendor_list):
+    """Hash of the vendor names the prompt was built from (order and duplicates don't matter)."""
+    names = sorted({str(name) for name in vendor_list})
+    return hashlib.sha256(json.dumps(names).encode()).hexdigest()
+
+
+def reusable(info):
+    """Only complete results are stored: no page failed (a 429 or timeout) and the rows did not fail reconciliation."""
+    return not info.get("failed_pages") and (info.get("reconciliation") or {}).get("status") != "mismatch"
+
+
+def registry_key(pdf_sha256, vendor_fp, ai_model, **settings):
+    """Key for one processed statement: PDF content hash, vendor list, model and any output-affecting settings."""
+    parts = {"version": REGISTRY_VERSION, "pdf": pdf_sha256, "vendors": vendor_fp, "model": ai_model, **settings}
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+class DocumentRegistry:
+    """Processed statements on disk, so re-uploaded PDFs return their stored transactions instantly.
+
+    Each entry is a pickle of (DataFrame, info) written atomically under
+    REGISTRY_DIR (DOCUMENT_REGISTRY_DIR) and shared by every session, so
+    entries hold the pipeline's output only; feedback corrections stay in
+    the session that made them.
+    """
+
+    def __init__(self, root=REGISTRY_DIR):
+        self.root = root
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.pkl")
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def get(self, key, document=None):
+        """Returns (DataFrame, info) or None; the Document column is relabelled to this upload's name."""
+        try:
+            with open(self._path(key), "rb") as f:
+                df, info = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            return None  # ✅ A truncated or outdated entry is just a cache miss
+        if document is not None and "Document" in df.columns:
+            df["Document"] = pd.Categorical.from_codes(np.zeros(len(df), dtype="int8"), categories=[document])
+        return df, info
+
+    def put(self, key, df, info):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump((df, info), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)  # ✅ Readers never see a half-written entry
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
@@ -0,0 +1,323 @@
+"""Local REST service for the statement pipeline.
+
+Statements are submitted as jobs, run on a background worker pool and polled
+for status and results, so other systems can push PDFs without the Streamlit UI.
+
+    python extraction_api.py --vendors vendors.csv --port 8600
+
+    POST /jobs?name=march.pdf&model=DeepSeek   body: the PDF (Content-Type: application/pdf)
+         header X-Api-Key (or DEEPSEEK_API_KEY / GEMINI_API_KEY in the server's environment)
+         optional query: tiered=0|1, skip_pages=0|1, engine=auto|pdfium|...
+    POST /jobs                                 body: JSON {"pdf_base64", "name", "model", "vendors", "api_key", ...}
+    GET  /jobs/<id>                            status, page counts and reconciliation
+    GET  /jobs/<id>/result[?format=csv|qbo|ofx] transactions once the job is done, as JSON, CSV or a bank feed
+    GET  /metrics                              Prometheus text from pipeline_metrics
+"""
+import argparse
+import base64
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from uploads import SpooledUpload, discard_upload
+from transactions import to_display_frame
+from pdf_backends import PDF_ENGINES
+from bulk_export import EXPORT_FORMATS, QBO_INTU_BID, write_ofx_export
+from reference_lists import normalize_names
+from statement_pipeline import MODEL_TIERS, load_vendor_list, process_document
+from document_registry import DocumentRegistry, registry_key, reusable, vendor_fingerprint
+from pipeline_metrics import new_run_id, bind, record_cache, prometheus_text
+
+
+API_WORKERS = int(os.environ.get("API_WORKERS", "4"))  # ✅ Documents in flight; pages inside each run concurrently already
+MAX_QUEUED_JOBS = int(os.environ.get("API_MAX_QUEUED_JOBS", "500"))
+MAX_FINISHED_JOBS = int(os.environ.get("API_MAX_FINISHED_JOBS", "1000"))  # ✅ Oldest finished results are dropped beyond this
+MAX_UPLOAD_BYTES = int(os.environ.get("API_MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+API_KEY_ENV = {"DeepSeek": "DEEPSEEK_API_KEY", "Gemini": "GEMINI_API_KEY"}
+CHUNK_SIZE = 1024 * 1024
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _flag(value, default):
+    if value is None:
+        return default
+    return str(value).lower() in ("1", "true", "yes", "on")
+
+
+class JobQueue:
+    """Extraction jobs run on a thread pool; status and results are kept in memory."""
+
+    def __init__(self, vendor_list, workers=API_WORKERS, registry=None):
+        self.vendor_list = vendor_list
+        self.registry = registry
+        self.run_id = new_run_id()
+        self._jobs = OrderedDict()  # job id -> job dict, oldest first
+        self._results = {}  # job id -> DataFrame
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="job")
+
+    def submit(self, upload, options):
+        job_id = uuid.uuid4().hex
+        job = {"id": job_id, "status": "queued", "document": upload.name, "sha256": upload.sha256, "model": options["model"],
+               "submitted_at": time.time(), "started_at": None, "finished_at": None, "rows": None, "reused": False,
+               "info": None, "error": None}
+        with self._lock:
+            queued = sum(1 for j in self._jobs.values() if j["status"] in ("queued", "running"))
+            if queued >= MAX_QUEUED_JOBS:
+                raise ApiError(503, "too many jobs in progress, retry later")
+            self._jobs[job_id] = job
+            self._evict()
+        self._pool.submit(self._run, job_id, upload, options)
+        return dict(job)
+
+    def _evict(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] in ("done", "failed")]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+            self._results.pop(job_id, None)
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def _run(self, job_id, upload, options):
+        self._update(job_id, status="running", started_at=time.time())
+        vendors = options.get("vendors") or self.vendor_list
+        key = registry_key(upload.sha256, vendor_fingerprint(vendors), options["model"],
+                           tiered=options["tiered"], skip_pages=options["skip_pages"], pdf_engine=options["engine"])
+        try:
+            with bind(run_id=self.run_id, mode="api", job=job_id, document=upload.name):
+                cached = self.registry.get(key, document=upload.name) if self.registry is not None else None
+                if self.registry is not None:
+                    record_cache("document_registry", cached is not None)
+                if cached is not None:
+                    df, info = cached
+                else:
+                    df, info = process_document(upload, vendors, options["api_key"], options["model"], document=upload.name,
+                                                skip_pages=options["skip_pages"], tiered=options["tiered"], pdf_engine=options["engine"])
+                    if df is not None and self.registry is not None and reusable(info):
+                        self.registry.put(key, df, info)  # ✅ Failed or unreconciled pages are retried next time
+            if df is None:
+                error = "; ".join(info["errors"]) or ("no transactions extracted" if info["pages"] else "unable to read PDF text")
+                self._update(job_id, status="failed", finished_at=time.time(), info=info, error=error)
+                return
+            with self._lock:
+                self._results[job_id] = df
+            self._update(job_id, status="done", finished_at=time.time(), rows=len(df), info=info, reused=cached is not None)
+        except Exception as e:
+            self._update(job_id, status="failed", finished_at=time.time(), error=str(e))
+        finally:
+            discard_upload(upload)
+
+    def status(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def result(self, job_id):
+        with self._lock:
+            return self._results.get(job_id)
+
+
+def _spool_body(stream, length, name):
+    """Streams a request body to a temp file, hashing it on the way."""
+    handle, path = tempfile.mkstemp(prefix="api_upload_", suffix=".pdf")
+    digest = hashlib.sha256()
+    remaining = length
+    with os.fdopen(handle, "wb") as out:
+        while remaining:
+            chunk = stream.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            out.write(chunk)
+            remaining -= len(chunk)
+    upload = SpooledUpload(name, path, length - remaining, digest.hexdigest())
+    if remaining:
+        discard_upload(upload)
+        raise ApiError(400, "request body ended early")
+    return upload
+
+
+def _spool_bytes(data, name):
+    handle, path = tempfile.mkstemp(prefix="api_upload_", suffix=".pdf")
+    with os.fdopen(handle, "wb") as out:
+        out.write(data)
+    return SpooledUpload(name, path, len(data), hashlib.sha256(data).hexdigest())
+
+
+def _job_options(params, headers, body_api_key=None):
+    """Job settings from the query string / JSON body; the API key only from the X-Api-Key header or JSON body."""
+    if "api_key" in params:
+        raise ApiError(400, "send the API key in the X-Api-Key header, not the URL")  # ✅ URLs end up in access logs
+    model = params.get("model") or "DeepSeek"
+    if model not in MODEL_TIERS:
+        raise ApiError(400, f"unknown model {model!r}, expected one of {sorted(MODEL_TIERS)}")
+    api_key = body_api_key or headers.get("X-Api-Key") or os.environ.get(API_KEY_ENV[model], "")
+    if not api_key:
+        raise ApiError(401, f"no API key: send X-Api-Key or set {API_KEY_ENV[model]} for the server")
+    vendors = params.get("vendors")
+    if vendors is not None:
+        if not isinstance(vendors, list):
+            raise ApiError(400, "vendors must be a list of names")
+        vendors = normalize_names(vendors)
+    engine = params.get("engine") or "auto"
+    if engine not in PDF_ENGINES:
+        raise ApiError(400, f"unknown engine {engine!r}, expected one of {PDF_ENGINES}")
+    return {"model": model, "api_key": api_key, "vendors": vendors, "engine": engine,
+            "tiered": _flag(params.get("tiered"), True), "skip_pages": _flag(params.get("skip_pages"), True)}
+
+
+def _json_default(value):
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+def make_handler(jobs):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, body, content_type="application/json", headers=None):
+            if not isinstance(body, bytes):
+                body = json.dumps(body, default=_json_default).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _route(self, handler):
+            try:
+                handler()
+            except ApiError as e:
+                self.close_connection = True  # ✅ The request body may be unread
+                self._send(e.status, {"error": str(e)})
+            except Exception as e:
+                self.close_connection = True
+                self._send(500, {"error": f"internal error: {type(e).__name__}"})
+
+        def do_POST(self):
+            self._route(self._post)
+
+        def do_GET(self):
+            self._route(self._get)
+
+        def _post(self):
+            url = urlsplit(self.path)
+            if url.path.rstrip("/") != "/jobs":
+                raise ApiError(404, "not found")
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+            except ValueError:
+                raise ApiError(400, "Content-Length must be an integer") from None
+            if not length:
+                raise ApiError(411, "Content-Length required")
+            if length > MAX_UPLOAD_BYTES:
+                raise ApiError(413, f"upload larger than {MAX_UPLOAD_BYTES} bytes")
+            params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            if self.headers.get("Content-Type", "").startswith("application/json"):
+                try:
+                    payload = json.loads(self.rfile.read(length))
+                    pdf_bytes = base64.b64decode(payload.pop("pdf_base64"), validate=True)
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    raise ApiError(400, "expected a JSON object with a base64 pdf_base64 field") from None
+                body_api_key = payload.pop("api_key", None)
+                params.update(payload)
+                options = _job_options(params, self.headers, body_api_key)
+                upload = _spool_bytes(pdf_bytes, params.get("name") or "statement.pdf")
+            else:
+                options = _job_options(params, self.headers)
+                upload = _spool_body(self.rfile, length, params.get("name") or "statement.pdf")
+            try:
+                job = jobs.submit(upload, options)
+            except ApiError:
+                discard_upload(upload)
+                raise
+            self._send(202, job, headers={"Location": f"/jobs/{job['id']}"})
+
+        def _get(self):
+            url = urlsplit(self.path)
+            parts = [part for part in url.path.split("/") if part]
+            if parts == ["metrics"]:
+                self._send(200, prometheus_text().encode(), "text/plain; version=0.0.4")
+                return
+            if len(parts) not in (2, 3) or parts[0] != "jobs" or (len(parts) == 3 and parts[2] != "result"):
+                raise ApiError(404, "not found")
+            job = jobs.status(parts[1])
+            if job is None:
+                raise ApiError(404, "unknown job")
+            if len(parts) == 2:
+                self._send(200, job)
+                return
+            if job["status"] != "done":
+                self._send(409, {"error": f"job is {job['status']}", "job": job})
+                return
+            result_format = parse_qs(url.query).get("format", ["json"])[-1]
+            if result_format in ("qbo", "ofx"):
+                feed = io.BytesIO()
+                write_ofx_export({job["document"]: jobs.result(parts[1])}, feed, intu_bid=QBO_INTU_BID if result_format == "qbo" else None,
+                                 document_ids={job["document"]: job["sha256"]})
+                mime = EXPORT_FORMATS["QBO (QuickBooks Web Connect)" if result_format == "qbo" else "OFX (bank feed)"][1]
+                self._send(200, feed.getvalue(), mime)
+                return
+            frame = to_display_frame(jobs.result(parts[1]))
+            if result_format == "csv":
+                self._send(200, frame.to_csv(index=False).encode("utf-8"), "text/csv; charset=utf-8")
+                return
+            body = {"job": job, "transactions": json.loads(frame.to_json(orient="records"))}
+            self._send(200, body)
+
+    return Handler
+
+
+def serve(vendor_list, host="127.0.0.1", port=8600, workers=API_WORKERS, reuse_processed=True):
+    jobs = JobQueue(vendor_list, workers, DocumentRegistry() if reuse_processed else None)
+    server = ThreadingHTTPServer((host, port), make_handler(jobs))
+    server.daemon_threads = True
+    return server, jobs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vendors", help="default Payee list (CSV or Excel) for jobs that don't send their own")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--workers", type=int, default=API_WORKERS, help="documents processed at once")
+    parser.add_argument("--no-reuse", action="store_true", help="always reprocess, ignoring the document registry")
+    args = parser.parse_args()
+
+    vendor_list = []
+    if args.vendors:
+        with open(args.vendors, "rb") as f:
+            vendor_list = load_vendor_list(f)
+    server, _ = serve(vendor_list, args.host, args.port, args.workers, not args.no_reuse)
+    print(f"Serving extraction API on http://{args.host}:{args.port} ({len(vendor_list)} vendors, {args.workers} workers)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
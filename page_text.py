@@ -0,0 +1,136 @@
+import math
+import re
+from collections import Counter
+
+from page_triage import ROW_DATE_PATTERN, AMOUNT_PATTERN
+
+
+LINE_TOLERANCE = 3.0  # points between word tops that still count as one row
+COLUMN_GAP = 8.0  # points of horizontal gap that separate two columns
+COLUMN_SEPARATOR = "\t"
+REPEAT_SHARE = 0.5  # a line on at least half the pages is treated as header/footer
+HEADER_KEYWORDS = ("date", "description", "deposit", "withdrawal", "addition", "subtraction", "credit", "debit", "balance")
+
+
+def _row_chunks(row_words):
+    """Splits one row of words into (x0, x1, text) chunks wherever the gap looks like a column break."""
+    chunks = []
+    for word in sorted(row_words, key=lambda w: w["x0"]):
+        if chunks and word["x0"] - chunks[-1][1] <= COLUMN_GAP:
+            x0, _, text = chunks[-1]
+            chunks[-1] = (x0, word["x1"], f"{text} {word['text']}")
+        else:
+            chunks.append((word["x0"], word["x1"], word["text"]))
+    return chunks
+
+
+def _is_header(text):
+    lowered = text.lower()
+    return sum(keyword in lowered for keyword in HEADER_KEYWORDS) >= 2
+
+
+def _align_to_columns(chunks, columns):
+    """Places each chunk under the nearest column title so empty deposit/withdrawal cells stay visible."""
+    cells = [""] * len(columns)
+    for x0, x1, text in chunks:
+        center = (x0 + x1) / 2
+        index = min(range(len(columns)), key=lambda i: abs(columns[i] - center))
+        cells[index] = f"{cells[index]} {text}".strip()
+    return COLUMN_SEPARATOR.join(cells).rstrip(COLUMN_SEPARATOR)
+
+
+def compact_words(words):
+    """Rebuilds compact rows from word dicts with "text", "x0", "x1" and "top" (pdfplumber's layout).
+
+    Columns are separated by a tab; rows carrying amounts are aligned to the
+    page's column titles so the model can tell deposits from withdrawals.
+    """
+    rows = []
+    for word in sorted(words, key=lambda w: (w["top"], w["x0"])):
+        if rows and abs(word["top"] - rows[-1][0]) <= LINE_TOLERANCE:
+            rows[-1][1].append(word)
+        else:
+            rows.append((word["top"], [word]))
+    rows = [_row_chunks(row_words) for _, row_words in rows]
+
+    # ✅ The widest title row (e.g. "Date  Description  Deposits  Withdrawals  Balance") defines the columns
+    header_rows = [chunks for chunks in rows if len(chunks) >= 3 and _is_header(" ".join(c[2] for c in chunks))]
+    columns = [(x0 + x1) / 2 for x0, x1, _ in max(header_rows, key=len)] if header_rows else None
+
+    lines = []
+    for chunks in rows:
+        has_amount = any(AMOUNT_PATTERN.fullmatch(text) for _, _, text in chunks)
+        if columns and has_amount:
+            lines.append(_align_to_columns(chunks, columns))
+        else:
+            lines.append(COLUMN_SEPARATOR.join(text for _, _, text in chunks))
+    return "\n".join(lines)
+
+
+def column_titles(text):
+    """Title cells of the widest column title row in compact_words text, or None; amount rows are aligned to these."""
+    titles = [line.split(COLUMN_SEPARATOR) for line in text.splitlines() if _is_header(line)]
+    titles = [cells for cells in titles if len(cells) >= 3]
+    return max(titles, key=len) if titles else None
+
+
+def collapse_whitespace(text):
+    """Collapses runs of spaces inside lines and drops blank lines."""
+    lines = (re.sub(r"[ \u00a0]+", " ", line).strip(" ") for line in text.splitlines())
+    return "\n".join(line for line in lines if line.strip())
+
+
+def _repeat_key(line):
+    """Normalizes digits so "Page 2 of 5" and "Page 3 of 5" count as the same footer."""
+    return re.sub(r"\d+", "#", line.strip().lower())
+
+
+def _is_protected(line):
+    """Transaction rows and column titles are never stripped, even when repeated."""
+    if ROW_DATE_PATTERN.match(line) and AMOUNT_PATTERN.search(line):
+        return True
+    return _is_header(line)
+
+
+def strip_repeated_lines(text_pages):
+    """Removes lines (bank header, account number, page footer) repeated across pages of one document."""
+    if len(text_pages) < 2:
+        return text_pages
+
+    page_counts = Counter()
+    for _, text in text_pages:
+        page_counts.update({_repeat_key(line) for line in text.splitlines() if line.strip()})
+    threshold = max(2, math.ceil(len(text_pages) * REPEAT_SHARE))
+    repeated = {key for key, count in page_counts.items() if count >= threshold}
+
+    stripped = []
+    for page_num, text in text_pages:
+        lines = [line for line in text.splitlines() if _repeat_key(line) not in repeated or _is_protected(line)]
+        stripped.append((page_num, "\n".join(lines)))
+    return stripped
+
+
+def estimate_tokens(text):
+    """Rough token estimate (about four characters per token) used for reporting savings."""
+    return len(text) // 4
+
+
+def plain_text_tokens(words):
+    """Token estimate for the words as plain space-separated text, i.e. the page before compact_words."""
+    return sum(len(word["text"]) + 1 for word in words) // 4
+
+
+def normalize_document_pages(text_pages, tokens_before=None):
+    """Runs the text-normalization stage on (page_num, text) pages of one document.
+
+    Returns the normalized non-empty pages and (tokens_before, tokens_after)
+    estimates for reporting. Pass tokens_before when the pages were already
+    compacted during extraction, so savings are measured against the
+    original text.
+    """
+    if tokens_before is None:
+        tokens_before = sum(estimate_tokens(text) for _, text in text_pages)
+    pages = [(page_num, collapse_whitespace(text)) for page_num, text in text_pages]
+    pages = [(page_num, text) for page_num, text in strip_repeated_lines(pages) if text.strip()]
+    tokens_after = sum(estimate_tokens(text) for _, text in pages)
+    return pages, (tokens_before, tokens_after)
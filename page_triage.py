@@ -0,0 +1,72 @@
+import re
+
+
+# ✅ A transaction row starts with a date (11/01, 11/01/2023, Nov 1) and carries a money amount
+ROW_DATE_PATTERN = re.compile(
+    r"^\s*(?:\d{1,2}/\d{1,2}(?:/\d{2,4})?|(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.? \d{1,2})\b",
+    re.IGNORECASE,
+)
+AMOUNT_PATTERN = re.compile(r"(?<![\d.])-?\$?\d{1,3}(?:,\d{3})*\.\d{2}(?![\d])")
+
+# ✅ Phrases that mark disclosure, fee schedule, check image and worksheet pages
+BOILERPLATE_SIGNATURES = [
+    "in case of errors or questions",
+    "important account information",
+    "privacy notice",
+    "fee schedule",
+    "schedule of fees",
+    "check images",
+    "images of checks",
+    "how to balance your account",
+    "balance your account",
+    "account balance calculation worksheet",
+    "this page intentionally left blank",
+    "terms and conditions",
+    "member fdic",
+    "equal housing lender",
+    "to dispute",
+    "notice of change",
+]
+
+MIN_TRANSACTION_ROWS = 2
+
+
+def count_transaction_rows(text):
+    """Counts lines that start with a date and carry a money amount."""
+    return sum(1 for line in text.splitlines() if ROW_DATE_PATTERN.match(line) and AMOUNT_PATTERN.search(line))
+
+
+def classify_page(text):
+    """Classifies page text as "transactions", "uncertain" or "skip" and returns (verdict, reason).
+
+    Only pages with no transaction-like rows at all are skipped; anything
+    ambiguous is kept so no real transactions are lost.
+    """
+    lines = [line for line in text.splitlines() if line.strip()]
+    if not lines:
+        return "skip", "empty page"
+
+    transaction_rows = count_transaction_rows(text)
+    if transaction_rows >= MIN_TRANSACTION_ROWS:
+        return "transactions", f"{transaction_rows} transaction rows"
+
+    lowered = text.lower()
+    boilerplate_hits = [signature for signature in BOILERPLATE_SIGNATURES if signature in lowered]
+    amount_count = len(AMOUNT_PATTERN.findall(text))
+
+    if transaction_rows == 0 and (amount_count == 0 or boilerplate_hits):
+        reason = f"boilerplate: {boilerplate_hits[0]}" if boilerplate_hits else "no dates or amounts"
+        return "skip", reason
+    return "uncertain", f"{transaction_rows} transaction rows, {amount_count} amounts"
+
+
+def triage_pages(text_pages):
+    """Splits (page_num, text) pages into pages worth an LLM call and skipped (page_num, reason) pages."""
+    kept_pages, skipped_pages = [], []
+    for page_num, text in text_pages:
+        verdict, reason = classify_page(text)
+        if verdict == "skip":
+            skipped_pages.append((page_num, reason))
+        else:
+            kept_pages.append((page_num, text))
+    return kept_pages, skipped_pages
@@ -0,0 +1,215 @@
+import importlib.util
+import os
+from contextlib import ExitStack, contextmanager
+
+from uploads import SpooledUpload, open_pdf_source
+from page_text import compact_words, estimate_tokens, plain_text_tokens
+
+
+PDF_ENGINES = ["auto", "pymupdf", "pdfium", "pdfplumber", "pypdf"]
+FAST_ENGINES = ["pymupdf", "pdfium"]  # ✅ C-backed, tried first by "auto"
+ENGINE_MODULES = {"pymupdf": ["fitz"], "pdfium": ["pypdfium2"], "pdfplumber": ["pdfplumber"], "pypdf": ["pypdf", "PyPDF2"]}
+AUTO_MIN_WORD_SHARE = 0.9  # ✅ A fast engine must keep this share of pdfplumber's words on the sample pages
+
+
+def engine_available(engine):
+    return any(importlib.util.find_spec(module) for module in ENGINE_MODULES.get(engine, []))
+
+
+def available_engines():
+    """Engines that can run here, with "auto" first."""
+    return ["auto"] + [engine for engine in PDF_ENGINES[1:] if engine_available(engine)]
+
+
+def _source_path(source):
+    if isinstance(source, SpooledUpload):
+        return source.path
+    if isinstance(source, (str, os.PathLike)):
+        return source
+    return None
+
+
+class PdfplumberDocument:
+    """pdfplumber: slowest, but the reference layout the prompts were tuned on."""
+
+    def __init__(self, source):
+        import pdfplumber
+
+        self._stack = ExitStack()
+        stream = self._stack.enter_context(open_pdf_source(source))
+        self._pdf = self._stack.enter_context(pdfplumber.open(stream))
+        self.page_count = len(self._pdf.pages)
+
+    def words(self, index):
+        return self._pdf.pages[index].extract_words(keep_blank_chars=False, use_text_flow=False)
+
+    def text(self, index):
+        return self._pdf.pages[index].extract_text() or ""
+
+    def close(self):
+        self._stack.close()
+
+
+class PdfiumDocument:
+    """pypdfium2 (Chrome's PDFium): text runs with boxes, an order of magnitude faster than pdfplumber."""
+
+    def __init__(self, source):
+        import pypdfium2
+
+        path = _source_path(source)
+        if path is None:
+            source.seek(0)
+        self._pdf = pypdfium2.PdfDocument(path if path is not None else source)  # ✅ PDFium reads the file itself
+        self.page_count = len(self._pdf)
+
+    def words(self, index):
+        page = self._pdf[index]
+        textpage = page.get_textpage()
+        try:
+            height = page.get_height()
+            words = []
+            for rect_index in range(textpage.count_rects()):
+                left, bottom, right, top = textpage.get_rect(rect_index)
+                text = textpage.get_text_bounded(left, bottom, right, top).strip()
+                if text:
+                    words.append({"text": text, "x0": left, "x1": right, "top": height - top, "bottom": height - bottom})
+            return words
+        finally:
+            textpage.close()
+            page.close()
+
+    def text(self, index):
+        page = self._pdf[index]
+        textpage = page.get_textpage()
+        try:
+            return textpage.get_text_range().replace("\r\n", "\n")
+        finally:
+            textpage.close()
+            page.close()
+
+    def close(self):
+        self._pdf.close()
+
+
+class PymupdfDocument:
+    """PyMuPDF (MuPDF), when installed: fastest word boxes."""
+
+    def __init__(self, source):
+        import fitz
+
+        path = _source_path(source)
+        if path is None:
+            source.seek(0)
+        self._pdf = fitz.open(path) if path is not None else fitz.open(stream=source.read(), filetype="pdf")
+        self.page_count = self._pdf.page_count
+
+    def words(self, index):
+        return [
+            {"text": text, "x0": x0, "x1": x1, "top": y0, "bottom": y1}
+            for x0, y0, x1, y1, text, *_ in self._pdf[index].get_text("words")
+        ]
+
+    def text(self, index):
+        return self._pdf[index].get_text()
+
+    def close(self):
+        self._pdf.close()
+
+
+class PypdfDocument:
+    """pypdf (or PyPDF2): pure Python, plain text only, no word positions."""
+
+    def __init__(self, source):
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            from PyPDF2 import PdfReader
+
+        self._stack = ExitStack()
+        self._reader = PdfReader(self._stack.enter_context(open_pdf_source(source)))
+        self.page_count = len(self._reader.pages)
+
+    def words(self, index):
+        return None
+
+    def text(self, index):
+        return self._reader.pages[index].extract_text() or ""
+
+    def close(self):
+        self._stack.close()
+
+
+ENGINE_CLASSES = {"pymupdf": PymupdfDocument, "pdfium": PdfiumDocument, "pdfplumber": PdfplumberDocument, "pypdf": PypdfDocument}
+
+
+@contextmanager
+def open_document(source, engine):
+    document = ENGINE_CLASSES[engine](source)
+    try:
+        yield document
+    finally:
+        document.close()
+
+
+def page_text(document, index, layout=True, stats=None):
+    """Page text as compact tab-separated rows (layout=True, when the engine has word boxes) or plain text.
+
+    With a stats dict, adds the token estimate of the page before compaction to stats["tokens"].
+    """
+    if layout:
+        words = document.words(index)
+        if words:
+            if stats is not None:
+                stats["tokens"] = stats.get("tokens", 0) + plain_text_tokens(words)
+            return compact_words(words)
+    text = document.text(index)
+    if stats is not None:
+        stats["tokens"] = stats.get("tokens", 0) + estimate_tokens(text)
+    return text.strip()
+
+
+def _sample_word_count(source, engine, layout):
+    with open_document(source, engine) as document:
+        sample = sorted({0, document.page_count // 2}) if document.page_count else []
+        return document.page_count, sum(len(page_text(document, index, layout).split()) for index in sample)
+
+
+def _fallback_engine(layout):
+    # ✅ Plain text needs no word boxes, and pypdf reads it several times faster than pdfplumber
+    return "pypdf" if not layout and engine_available("pypdf") else "pdfplumber"
+
+
+def choose_engine(source, layout=True):
+    """Picks the fastest installed engine that keeps pdfplumber's words on a first and a middle page.
+
+    Without one, layout text comes from pdfplumber and plain text from pypdf.
+    """
+    fast_engines = [engine for engine in FAST_ENGINES if engine_available(engine)]
+    if not fast_engines:
+        return _fallback_engine(layout)
+    reference_pages, reference_words = _sample_word_count(source, "pdfplumber", layout)
+    for engine in fast_engines:
+        try:
+            pages, words = _sample_word_count(source, engine, layout)
+        except Exception:
+            continue  # ✅ An engine that can't open this file just isn't chosen
+        if pages == reference_pages and words >= reference_words * AUTO_MIN_WORD_SHARE:
+            return engine
+    return _fallback_engine(layout)
+
+
+def extract_pages(source, engine="auto", layout=True, stats=None):
+    """Extracts (page_num, text) for the non-empty pages of a PDF path, SpooledUpload or file object.
+
+    Returns (pages, engine used); engine="auto" picks one per document. A
+    stats dict receives the "tokens" estimate of the text before compaction.
+    """
+    if engine == "auto":
+        engine = choose_engine(source, layout)
+    pages = []
+    with open_document(source, engine) as document:
+        for index in range(document.page_count):
+            text = page_text(document, index, layout, stats)
+            if text:
+                pages.append((index + 1, text.strip()))
+    return pages, engine
@@ -0,0 +1,213 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+METRICS_FILE = os.environ.get("PIPELINE_METRICS_FILE", os.path.join(os.path.expanduser("~"), ".cache", "table_extraction", "pipeline_metrics.jsonl"))
+METRICS_MAX_BYTES = int(os.environ.get("PIPELINE_METRICS_MAX_BYTES", str(20 * 1024 * 1024)))  # ✅ Rotated to METRICS_FILE + ".1" past this size
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
+_recent_events = deque(maxlen=20_000)
+_write_lock = threading.Lock()
+_context = contextvars.ContextVar("pipeline_metrics_context", default={})
+_metrics_server = None
+
+
+def new_run_id():
+    return time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+
+
+@contextmanager
+def bind(**fields):
+    """Attaches fields (run_id, mode, document, page, ...) to every span recorded inside the block."""
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def _open_metrics_file():
+    try:
+        return open(METRICS_FILE, "a", encoding="utf-8")
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(os.path.abspath(METRICS_FILE)), exist_ok=True)
+        return open(METRICS_FILE, "a", encoding="utf-8")
+
+
+def record_event(event):
+    """Keeps an event in memory and appends it as one JSON line to METRICS_FILE.
+
+    Once the file grows past METRICS_MAX_BYTES it is renamed to METRICS_FILE + ".1"
+    (replacing the previous one), so at most two files' worth of events are kept.
+    """
+    _recent_events.append(event)
+    line = json.dumps(event, default=str)
+    with _write_lock:
+        try:
+            with _open_metrics_file() as f:
+                f.write(line + "\n")
+                full = f.tell() > METRICS_MAX_BYTES
+            if full:
+                os.replace(METRICS_FILE, METRICS_FILE + ".1")
+        except OSError:
+            pass  # ✅ Metrics must never break processing
+
+
+@contextmanager
+def span(stage, **attrs):
+    """Times a pipeline stage and records it with the bound context; yields a dict for extra attributes."""
+    event = {"ts": time.time(), "stage": stage, **_context.get(), **attrs}
+    started = time.perf_counter()
+    try:
+        yield event
+    except Exception as e:
+        event["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        event["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        record_event(event)
+
+
+def record_usage(event, usage):
+    """Copies token counts from an OpenAI-style `usage` dict or a LangChain `usage_metadata` dict."""
+    if not usage:
+        return
+    event["prompt_tokens"] = usage.get("prompt_tokens", usage.get("input_tokens", 0)) or 0
+    event["completion_tokens"] = usage.get("completion_tokens", usage.get("output_tokens", 0)) or 0
+    if usage.get("prompt_cache_hit_tokens"):
+        event["cached_prompt_tokens"] = usage["prompt_cache_hit_tokens"]
+
+
+def record_cache(cache, hit, **attrs):
+    """Records a cache lookup (document registry, answer cache, ...) as a zero-latency event."""
+    record_event({"ts": time.time(), "stage": "cache", "cache": cache, "hit": bool(hit), **_context.get(), **attrs, "latency_ms": 0.0})
+
+
+def recent_events():
+    return list(_recent_events)
+
+
+def latency_percentile(stage, provider, percentile, window=200, min_samples=1):
+    """Returns the percentile latency in seconds over the last `window` successful spans, or None."""
+    latencies = []
+    for event in reversed(_recent_events.copy()):  # ✅ Snapshot; worker threads keep appending
+        if event.get("stage") == stage and event.get("provider") == provider and not event.get("error"):
+            latencies.append(event["latency_ms"] / 1000)
+            if len(latencies) == window:
+                break
+    if len(latencies) < max(min_samples, 1):
+        return None
+    latencies.sort()
+    return latencies[min(len(latencies) - 1, int(len(latencies) * percentile / 100))]
+
+
+def metrics_file_signature(path=None):
+    """(mtime, size) of the metrics file and its rotated copy; changes whenever an event is written."""
+    path = path or METRICS_FILE
+    signature = []
+    for part in (path + ".1", path):
+        try:
+            stat = os.stat(part)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def load_events(path=None, limit=None):
+    """Reads recorded events back from the JSON-lines file and its rotated copy (most recent `limit` lines)."""
+    path = path or METRICS_FILE
+    lines = deque(maxlen=limit or None)
+    for part in (path + ".1", path):  # ✅ Oldest first, so right after a rotation the latest events are still found
+        if os.path.exists(part):
+            with open(part, encoding="utf-8") as f:
+                lines.extend(f)
+    events = []
+    for line in lines:
+        try:
+            events.append(json.loads(line))
+        except json.JSONDecodeError:
+            continue
+    return events
+
+
+def _label(**labels):
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+def prometheus_text(events=None):
+    """Renders events as Prometheus text exposition: stage latency histograms, tokens, retries, cache hits."""
+    events = recent_events() if events is None else events
+    buckets = defaultdict(lambda: [0] * len(LATENCY_BUCKETS))
+    counts, sums = defaultdict(int), defaultdict(float)
+    tokens, retries, errors = defaultdict(int), defaultdict(int), defaultdict(int)
+    cache = defaultdict(int)
+
+    for event in events:
+        if event.get("stage") == "cache":
+            cache[(event.get("cache", ""), "hit" if event.get("hit") else "miss")] += 1
+            continue
+        key = (event.get("stage", ""), event.get("provider", ""))
+        seconds = event.get("latency_ms", 0) / 1000
+        counts[key] += 1
+        sums[key] += seconds
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                buckets[key][index] += 1
+        if event.get("error") or (event.get("status") and event["status"] != 200):
+            errors[key] += 1
+        provider = event.get("provider", "")
+        tokens[(provider, "prompt")] += event.get("prompt_tokens", 0)
+        tokens[(provider, "completion")] += event.get("completion_tokens", 0)
+        tokens[(provider, "cached_prompt")] += event.get("cached_prompt_tokens", 0)
+        retries[provider] += event.get("retries", 0) if event.get("stage") == "provider" else 0
+
+    lines = ["# HELP pipeline_stage_seconds Latency of pipeline stages.", "# TYPE pipeline_stage_seconds histogram"]
+    for (stage, provider), stage_buckets in sorted(buckets.items()):
+        for bound, count in zip(LATENCY_BUCKETS, stage_buckets):
+            lines.append(f"pipeline_stage_seconds_bucket{_label(stage=stage, provider=provider, le=bound)} {count}")
+        lines.append(f"pipeline_stage_seconds_bucket{_label(stage=stage, provider=provider, le='+Inf')} {counts[(stage, provider)]}")
+        lines.append(f"pipeline_stage_seconds_sum{_label(stage=stage, provider=provider)} {sums[(stage, provider)]:.6f}")
+        lines.append(f"pipeline_stage_seconds_count{_label(stage=stage, provider=provider)} {counts[(stage, provider)]}")
+    lines += ["# HELP pipeline_stage_errors_total Failed stage executions.", "# TYPE pipeline_stage_errors_total counter"]
+    lines += [f"pipeline_stage_errors_total{_label(stage=s, provider=p)} {n}" for (s, p), n in sorted(errors.items())]
+    lines += ["# HELP pipeline_tokens_total Tokens reported by provider usage fields.", "# TYPE pipeline_tokens_total counter"]
+    lines += [f"pipeline_tokens_total{_label(provider=p, kind=k)} {n}" for (p, k), n in sorted(tokens.items()) if p]
+    lines += ["# HELP pipeline_retries_total Provider calls that were retries.", "# TYPE pipeline_retries_total counter"]
+    lines += [f"pipeline_retries_total{_label(provider=p)} {n}" for p, n in sorted(retries.items()) if p]
+    lines += ["# HELP pipeline_cache_lookups_total Cache lookups by result.", "# TYPE pipeline_cache_lookups_total counter"]
+    lines += [f"pipeline_cache_lookups_total{_label(cache=c, result=r)} {n}" for (c, r), n in sorted(cache.items())]
+    return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(port, host="0.0.0.0"):
+    """Serves prometheus_text() at /metrics from a daemon thread (once per process)."""
+    global _metrics_server
+    if _metrics_server is not None:
+        return _metrics_server
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    _metrics_server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=_metrics_server.serve_forever, daemon=True).start()
+    return _metrics_server
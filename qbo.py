@@ -3,9 +3,10 @@ import pandas as pd
 import json
 import re
 from datetime import datetime
-from PyPDF2 import PdfReader
 from io import BytesIO
-from langchain_google_genai import ChatGoogleGenerativeAI
+from pdf_backends import extract_pages
+from reference_lists import load_names
+from account_classifier import load_classifier, classify_locally, log_classifications
 
 gemini_api_key = ".."  # Replace with your actual API key
 
@@ -23,13 +24,8 @@ chart_file = st.sidebar.file_uploader("Chart of Accounts (Excel)", type=["xls",
 def extract_raw_text(pdf_content):
     """Extracts text from PDF content (BytesIO)"""
     try:
-        reader = PdfReader(pdf_content)
-        text = ""
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-        return text
+        pages, _ = extract_pages(pdf_content, layout=False)  # ✅ Fastest engine that keeps the text, picked per document
+        return "".join(text + "\n" for _, text in pages)
     except Exception as e:
         st.error(f"Error reading PDF: {str(e)}")
         return ""
@@ -99,6 +95,8 @@ def extract_transactions(text):
     #     st.error(f"Transaction extraction failed: {str(e)}")
     #     return pd.DataFrame()
 
+    from langchain_google_genai import ChatGoogleGenerativeAI  # ✅ Imported on first Gemini call
+
     try:
         gemini = ChatGoogleGenerativeAI(model="gemini-2.0-pro-exp-02-05", google_api_key=gemini_api_key, temperature=0)
         response = gemini.invoke(prompt)
@@ -121,12 +119,33 @@ def extract_transactions(text):
         st.error(f"Transaction extraction failed: {str(e)}")
         return pd.DataFrame()
 
-def classify_transactions(transactions_df, vendor_df, chart_df):
-    """Classifies Vendor Name and Account for extracted transactions (Step 2)."""
+def classify_transactions(transactions_df, vendors, accounts):
+    """Classifies Vendor Name and Account for extracted transactions (Step 2).
+
+    Descriptions the local classifier is confident about are labelled on CPU;
+    only the rest are sent to Gemini.
+    """
     if transactions_df.empty:
         return transactions_df
-    vendor_list = "\n".join([f"- {vendor}" for vendor in vendor_df['Payee'].dropna().unique()])
-    chart_of_accounts = "\n".join([f"- {acc}" for acc in chart_df['Account'].unique()])
+    descriptions = transactions_df['Description'].drop_duplicates()
+    classified = pd.DataFrame(columns=['Description', 'Vendor Name', 'Account', 'Classified By'])
+    classifier = load_classifier()
+    if classifier is not None:
+        predicted, confident = classify_locally(descriptions, vendors, accounts, classifier)
+        classified = predicted[confident].drop(columns='Confidence').assign(**{'Classified By': 'local'})
+        descriptions = descriptions[~descriptions.isin(classified['Description'])]
+    if not descriptions.empty:
+        from_model = classify_with_gemini(descriptions, vendors, accounts)
+        if not from_model.empty:
+            log_classifications(from_model, "model")  # ✅ Model answers become training history
+            classified = pd.concat([classified, from_model.assign(**{'Classified By': 'gemini'})], ignore_index=True)
+    return transactions_df.merge(classified, on='Description', how='left')
+
+
+def classify_with_gemini(descriptions, vendors, accounts):
+    """Asks Gemini for Vendor Name and Account of each description."""
+    vendor_list = "\n".join([f"- {vendor}" for vendor in vendors])
+    chart_of_accounts = "\n".join([f"- {acc}" for acc in accounts])
 
 
     prompt = f"""
@@ -168,36 +187,67 @@ def classify_transactions(transactions_df, vendor_df, chart_df):
         }}
     ]
     Transactions:
-    {transactions_df[['Description']].to_json(orient='records')}
+    {descriptions.to_frame('Description').to_json(orient='records')}
     """
+    from langchain_google_genai import ChatGoogleGenerativeAI  # ✅ Imported on first Gemini call
+
     try:
         gemini = ChatGoogleGenerativeAI(model="gemini-2.0-pro-exp-02-05", google_api_key=gemini_api_key, temperature=0)
         response = gemini.invoke(prompt)
         json_data = response.content.strip()
         clean_json = extract_json(json_data)
         classified_data = pd.DataFrame(json.loads(clean_json)) if clean_json else pd.DataFrame()
-        return transactions_df.merge(classified_data, on='Description', how='left')
+        if classified_data.empty:
+            return classified_data
+        return classified_data[['Description', 'Vendor Name', 'Account']].drop_duplicates('Description')
     except Exception as e:
         st.error(f"Classification failed: {str(e)}")
-        return transactions_df
+        return pd.DataFrame()
 
 if pdf_file and vendor_file and chart_file:
-    with st.spinner('Processing your files...'):
-        try:
-            pdf_content = pdf_file.read()
-            vendor_df = pd.read_excel(vendor_file)
-            chart_df = pd.read_excel(chart_file)
-            raw_text = extract_raw_text(BytesIO(pdf_content))
-            transactions_df = extract_transactions(raw_text)
-            transactions_df = classify_transactions(transactions_df, vendor_df, chart_df)
-            if not transactions_df.empty:
-                st.dataframe(transactions_df)
-                csv = transactions_df.to_csv(index=False).encode('utf-8')
-                st.download_button("Download CSV", data=csv, file_name="classified_transactions.csv", mime="text/csv")
-            else:
-                st.error("No transactions found.")
-        except Exception as e:
-            st.error(f"Processing error: {str(e)}")
+    upload_key = tuple((f.name, f.size) for f in (pdf_file, vendor_file, chart_file))
+    if st.session_state.get("qbo_upload_key") != upload_key:
+        # ✅ Process once per set of uploads; reruns from the correction widgets reuse the result
+        with st.spinner('Processing your files...'):
+            try:
+                vendors = load_names(vendor_file, "Payee")  # ✅ Only the needed column, cached by file hash
+                accounts = load_names(chart_file, "Account")
+                pdf_content = pdf_file.read()
+                raw_text = extract_raw_text(BytesIO(pdf_content))
+                transactions_df = extract_transactions(raw_text)
+                st.session_state.qbo_transactions = classify_transactions(transactions_df, vendors, accounts)
+                st.session_state.qbo_accounts = accounts  # ✅ Options for the correction dropdown on later reruns
+                st.session_state.qbo_upload_key = upload_key
+            except Exception as e:
+                st.error(f"Processing error: {str(e)}")
+    transactions_df = st.session_state.get("qbo_transactions", pd.DataFrame())
+    if st.session_state.get("qbo_upload_key") != upload_key:
+        pass  # ✅ Processing failed; the error is already shown
+    elif not transactions_df.empty:
+        if 'Classified By' in transactions_df:
+            counts = transactions_df['Classified By'].value_counts()
+            st.caption(f"Classified locally: {counts.get('local', 0)} · by Gemini: {counts.get('gemini', 0)} · corrected: {counts.get('correction', 0)}")
+        st.dataframe(transactions_df)
+        csv = transactions_df.drop(columns='Classified By', errors='ignore').to_csv(index=False).encode('utf-8')  # ✅ Same CSV layout as before
+        st.download_button("Download CSV", data=csv, file_name="classified_transactions.csv", mime="text/csv")
+
+        # ✅ Corrections are logged and train the local classifier for the next statement
+        st.subheader("📝 Correct a Classification")
+        selected_desc = st.selectbox("Select a Transaction to Correct", transactions_df['Description'].unique())
+        selected_row = transactions_df[transactions_df['Description'] == selected_desc].iloc[0]
+        correct_vendor = st.text_input("Correct Vendor", selected_row.get('Vendor Name') if pd.notna(selected_row.get('Vendor Name')) else "")
+        accounts = st.session_state.qbo_accounts
+        account_options = accounts if "Other Expenses" in accounts else accounts + ["Other Expenses"]
+        current_account = selected_row.get('Account')
+        correct_account = st.selectbox("Correct Account", account_options, index=account_options.index(current_account) if current_account in account_options else 0)
+        if st.button("✅ Save Correction"):
+            correction = pd.DataFrame([{'Description': selected_desc, 'Vendor Name': correct_vendor, 'Account': correct_account}])
+            log_classifications(correction, "correction")
+            mask = transactions_df['Description'] == selected_desc
+            transactions_df.loc[mask, ['Vendor Name', 'Account', 'Classified By']] = correct_vendor, correct_account, 'correction'
+            st.session_state.qbo_transactions = transactions_df
+            st.success("✅ Correction saved and added to the training history.")
+    else:
+        st.error("No transactions found.")
 else:
     st.info("Please upload all three files to begin processing")
-
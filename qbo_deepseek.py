@@ -1,9 +1,9 @@
 import streamlit as st
 import requests
 import json
-import pdfplumber
 import pandas as pd
-from io import BytesIO
+from pdf_backends import extract_pages
+from reference_lists import load_names
 
 
 API_URL = "https://api.deepseek.com/v1/chat/completions"  
@@ -200,13 +200,8 @@ if "transactions" not in st.session_state:
 # ✅ Extract Text from PDF
 def extract_text_from_pdf(pdf_file):
     """Extracts text from each page of a PDF file and returns a list of pages."""
-    text_pages = []
-    with pdfplumber.open(BytesIO(pdf_file.read())) as pdf:
-        for page in pdf.pages:
-            text = page.extract_text()
-            if text:
-                text_pages.append(text.strip())  # Store cleaned text per page
-    return text_pages
+    pages, _ = extract_pages(pdf_file, layout=False)  # ✅ Fastest engine that keeps the text, picked per document
+    return [text for _, text in pages]
 
 # ✅ Process and Categorize Transactions
 
@@ -286,10 +281,7 @@ def process_and_categorize(text, vendor_list):
 # ✅ Load Vendor List
 def load_vendor_list(vendor_file):
     """Loads vendor list from CSV or Excel and returns a list."""
-    if vendor_file.name.endswith(".csv"):
-        return pd.read_csv(vendor_file)["Payee"].tolist()
-    else:
-        return pd.read_excel(vendor_file)["Payee"].tolist()
+    return load_names(vendor_file, "Payee")  # ✅ Only the Payee column, cleaned and cached by file hash
 
 # ✅ Feedback Collection
 def save_feedback(feedback_data):
@@ -0,0 +1,171 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from page_triage import ROW_DATE_PATTERN, AMOUNT_PATTERN
+from page_text import COLUMN_SEPARATOR, column_titles
+from transactions import normalize_transactions, parse_amounts_to_cents
+
+
+MONEY = r"(\(?-?\$?\d{1,3}(?:,\d{3})*\.\d{2}\)?)"
+OPENING_PATTERN = re.compile(r"(?:beginning|opening|previous|starting)\s+balance(?:\s+on\s+[\d/]+)?\s*:?\s*" + MONEY, re.IGNORECASE)
+CLOSING_PATTERN = re.compile(r"(?:ending|closing|new)\s+balance(?:\s+on\s+[\d/]+)?\s*:?\s*" + MONEY, re.IGNORECASE)
+ROW_DATE = re.compile(r"^\s*(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?")
+MAX_REQUERY_PAGES = 3
+
+
+def _to_cents(text):
+    return int(parse_amounts_to_cents([text])[0])
+
+
+def _balance_column(text):
+    """Index of the balance cell in the page's tab-aligned rows, or None without a balance column."""
+    titles = column_titles(text)
+    columns = [index for index, title in enumerate(titles or []) if "balance" in title.lower()]
+    return columns[-1] if columns else None
+
+
+def find_statement_balances(text_pages):
+    """Finds the printed opening and closing balance (in cents) on any page, or None."""
+    opening = closing = None
+    for _, text in text_pages:
+        opening_match = OPENING_PATTERN.search(text) if opening is None else None
+        if opening_match:
+            opening = _to_cents(opening_match.group(1))
+        closing_match = CLOSING_PATTERN.search(text) if closing is None else None
+        if closing_match:
+            closing = _to_cents(closing_match.group(1))
+    return opening, closing
+
+
+def find_daily_balances(text_pages):
+    """Collects printed ending daily balances as (page, month, day, year or None, cents) checkpoints.
+
+    A dated row carries a balance when the cell under the page's balance
+    column title holds an amount; amounts inside the description don't count.
+    Only the last such row of each date is kept: rows later that day (even on
+    the next page) would otherwise be compared against a balance printed
+    before them.
+    """
+    checkpoints = {}
+    for page_num, text in text_pages:
+        column = _balance_column(text)
+        if column is None:
+            continue
+        for line in text.splitlines():
+            date_match = ROW_DATE.match(line)
+            if not date_match or not ROW_DATE_PATTERN.match(line):
+                continue
+            cells = line.split(COLUMN_SEPARATOR)
+            balance = cells[column].strip() if column < len(cells) else ""
+            if AMOUNT_PATTERN.fullmatch(balance):
+                month, day, year = date_match.groups()
+                year = int(year) + (2000 if len(year) == 2 else 0) if year else None
+                key = (int(month), int(day), year)
+                checkpoints.pop(key, None)  # ✅ Re-insert so checkpoints stay in statement order
+                checkpoints[key] = (page_num, int(month), int(day), year, _to_cents(balance))
+    return list(checkpoints.values())
+
+
+def _checkpoint_dates(checkpoints, row_dates):
+    """Resolves month/day checkpoints to datetimes, picking the year closest to the extracted rows."""
+    known = row_dates.dropna()
+    anchor = known.median() if not known.empty else pd.Timestamp.today()
+    resolved = []
+    for _, month, day, year, _ in checkpoints:
+        years = [year] if year else [anchor.year - 1, anchor.year, anchor.year + 1]
+        candidates = []
+        for candidate_year in years:
+            try:
+                candidates.append(pd.Timestamp(year=candidate_year, month=month, day=day))
+            except ValueError:
+                continue
+        resolved.append(min(candidates, key=lambda ts: abs(ts - anchor)) if candidates else pd.NaT)
+    return pd.DatetimeIndex(resolved)
+
+
+def reconcile(df, text_pages):
+    """Checks extracted rows against the statement's printed balances.
+
+    Returns a report dict with "status" ("reconciled", "mismatch" or
+    "unverifiable"), the closing "difference" in cents, the number of
+    "failed_checkpoints" and the "suspect_pages" whose rows don't add up.
+    """
+    opening, closing = find_statement_balances(text_pages)
+    report = {"status": "unverifiable", "opening": opening, "closing": closing, "difference": 0,
+              "checkpoints": 0, "failed_checkpoints": 0, "suspect_pages": []}
+    if opening is None or df.empty:
+        return report
+
+    net = (df["Deposits_Credits"] - df["Withdrawals_Debits"]).to_numpy(dtype="int64")
+    pages = df["Page"].to_numpy() if "Page" in df.columns else np.zeros(len(df), dtype="int16")
+
+    if closing is not None:
+        report["difference"] = int(opening + net.sum() - closing)
+
+    checkpoints = find_daily_balances(text_pages)
+    if checkpoints:
+        cp_pages = np.array([cp[0] for cp in checkpoints])
+        cp_balances = np.array([cp[4] for cp in checkpoints], dtype="int64")
+        cp_dates = _checkpoint_dates(checkpoints, df["Date"]).to_numpy()
+        row_dates = df["Date"].to_numpy()
+
+        # ✅ rows x checkpoints: a row counts towards a checkpoint if it is on an earlier page or same page and day
+        before = (pages[:, None] < cp_pages[None, :]) | (
+            (pages[:, None] == cp_pages[None, :]) & (row_dates[:, None] <= cp_dates[None, :])
+        )
+        drift = opening + net @ before - cp_balances
+        report["checkpoints"] = len(checkpoints)
+        report["failed_checkpoints"] = int(np.count_nonzero(drift))
+
+        # ✅ The drift only changes where rows are missing or invented, so each jump points at a page range
+        jumps = np.flatnonzero(np.diff(np.concatenate([[0], drift])))
+        suspects = set()
+        for index in jumps:
+            start = cp_pages[index - 1] if index > 0 else cp_pages[index]
+            suspects.update(range(int(start), int(cp_pages[index]) + 1))
+        if closing is not None and report["difference"] != (drift[-1] if len(drift) else 0):
+            suspects.update(range(int(cp_pages[-1]), int(max(pages.max(), cp_pages[-1])) + 1))
+        report["suspect_pages"] = sorted(suspects)
+
+    mismatch = report["difference"] != 0 or report["failed_checkpoints"] > 0
+    if closing is None and not checkpoints:
+        return report
+    report["status"] = "mismatch" if mismatch else "reconciled"
+    return report
+
+
+def _problem_score(report):
+    return report["failed_checkpoints"] + (1 if report["difference"] else 0)
+
+
+def build_document_frame(page_records, document=None):
+    """Normalizes {page_num: [transaction dicts]} into one frame with a Page column."""
+    records = [dict(record, Page=page_num) for page_num, page_rows in sorted(page_records.items()) for record in page_rows]
+    return normalize_transactions(records, document=document)
+
+
+def reconcile_and_repair(page_records, text_pages, requery_page, document=None, max_requery_pages=MAX_REQUERY_PAGES):
+    """Reconciles a document and re-queries only the pages whose rows don't add up.
+
+    requery_page(page_num) must return fresh transaction dicts for that page.
+    A re-queried page is kept only if it lowers the number of failed checks.
+    Returns (DataFrame, report) with "requeried_pages" added to the report.
+    """
+    df = build_document_frame(page_records, document)
+    report = reconcile(df, text_pages)
+    available_pages = {page_num for page_num, _ in text_pages}
+    requeried = []
+    for page_num in [p for p in report["suspect_pages"] if p in available_pages][:max_requery_pages]:
+        if report["status"] != "mismatch":
+            break
+        requeried.append(page_num)
+        candidate_records = dict(page_records)
+        candidate_records[page_num] = requery_page(page_num)
+        candidate_df = build_document_frame(candidate_records, document)
+        candidate_report = reconcile(candidate_df, text_pages)
+        if _problem_score(candidate_report) < _problem_score(report):
+            page_records, df, report = candidate_records, candidate_df, candidate_report
+    report["requeried_pages"] = requeried
+    return df, report
@@ -0,0 +1,133 @@
+import hashlib
+import io
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from pipeline_metrics import record_cache
+
+
+INDEX_DIR = os.environ.get("REFERENCE_INDEX_DIR", os.path.join(os.path.expanduser("~"), ".cache", "table_extraction", "lists"))
+INDEX_VERSION = 1  # ✅ Bump when normalize_names changes so old indexes are rebuilt
+
+
+def normalize_names(values):
+    """Strips and collapses whitespace, drops blanks and keeps the first spelling of case-insensitive duplicates."""
+    names, seen = [], set()
+    for value in values:
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            continue
+        name = " ".join(str(value).split())
+        folded = name.casefold()
+        if name and folded not in seen:
+            seen.add(folded)
+            names.append(name)
+    return names
+
+
+def _file_bytes(source):
+    """A bytes-like view of an upload, path or file object without copying Streamlit's buffer."""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            return f.read()
+    if hasattr(source, "getbuffer"):
+        return source.getbuffer()
+    source.seek(0)
+    return source.read()
+
+
+def _source_name(source):
+    return str(source) if isinstance(source, (str, os.PathLike)) else getattr(source, "name", "")
+
+
+def _read_xlsx_column(data, column):
+    """Streams one column of the first sheet with openpyxl's read-only reader."""
+    from openpyxl import load_workbook  # ✅ Only needed on an index miss
+
+    workbook = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        header = next(sheet.iter_rows(max_row=1, values_only=True), ())
+        labels = [str(label).strip() if label is not None else "" for label in header]
+        if column not in labels:
+            raise KeyError(f"'{column}' column not found")
+        index = labels.index(column) + 1
+        return [row[0] for row in sheet.iter_rows(min_row=2, min_col=index, max_col=index, values_only=True)]
+    finally:
+        workbook.close()
+
+
+def read_column(source, column):
+    """Reads a single column from a CSV, XLSX or XLS file without parsing the rest of the sheet."""
+    name = _source_name(source).lower()
+    data = _file_bytes(source)
+    try:
+        if name.endswith(".csv"):
+            try:
+                frame = pd.read_csv(io.BytesIO(data), usecols=[column], dtype=str)
+            except ValueError as e:
+                raise KeyError(f"'{column}' column not found") from e
+            return frame[column].tolist()
+        if name.endswith(".xls"):
+            return pd.read_excel(io.BytesIO(data), usecols=[column], dtype=str)[column].tolist()
+        return _read_xlsx_column(data, column)
+    finally:
+        if isinstance(data, memoryview):
+            data.release()
+
+
+def _index_path(digest, column, root):
+    key = hashlib.sha256(f"{INDEX_VERSION}:{digest}:{column}".encode()).hexdigest()
+    return os.path.join(root, f"{key}.npz")
+
+
+def _save_index(path, names):
+    encoded = [name.encode("utf-8") for name in names]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(item) for item in encoded], out=offsets[1:])
+    blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, offsets=offsets, blob=blob)
+        os.replace(tmp_path, path)  # ✅ Readers never see a half-written index
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _load_index(path):
+    with np.load(path) as index:
+        offsets, blob = index["offsets"], index["blob"].tobytes()
+    return [blob[start:end].decode("utf-8") for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+
+
+def load_names(source, column, root=INDEX_DIR):
+    """Normalized, de-duplicated names from one column of a CSV or Excel file.
+
+    The result is cached on disk as a compact offsets + UTF-8 blob index keyed
+    by the file's sha256, so reloading the same list skips spreadsheet parsing.
+    """
+    data = _file_bytes(source)
+    try:
+        digest = hashlib.sha256(data).hexdigest()
+    finally:
+        if isinstance(data, memoryview):
+            data.release()
+    path = _index_path(digest, column, root)
+    try:
+        names = _load_index(path)
+    except Exception:
+        names = None  # ✅ Missing or unreadable index is just a miss
+    record_cache("reference_index", names is not None, column=column)
+    if names is not None:
+        return names
+    names = normalize_names(read_column(source, column))
+    try:
+        _save_index(path, names)
+    except OSError:
+        pass  # ✅ A read-only cache dir only costs the next reload
+    return names
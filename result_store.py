@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+import weakref
+from collections import OrderedDict
+
+import pandas as pd
+
+
+MAX_DOCUMENTS_IN_MEMORY = int(os.environ.get("BULK_RESULTS_IN_MEMORY", "8"))
+
+
+class ResultStore:
+    """Dict-like store of per-document DataFrames for bulk runs.
+
+    Only the most recently used documents stay in memory; the rest are
+    spilled to pickle files in a private temp directory and loaded again
+    when they are selected. A frame edited in place must be assigned back
+    (store[name] = df) so its spill file is rewritten.
+    """
+
+    def __init__(self, max_in_memory=MAX_DOCUMENTS_IN_MEMORY, spill_dir=None):
+        self.max_in_memory = max(1, max_in_memory)
+        self._memory = OrderedDict()  # document -> DataFrame, least recently used first
+        self._paths = {}  # document -> spill file path
+        self._names = []  # documents in insertion order
+        self._dirty = set()  # documents whose spill file is missing or older than the frame in memory
+        self._spilled_files = 0
+        if spill_dir is None:
+            spill_dir = tempfile.mkdtemp(prefix="bulk_results_")
+            # ✅ Remove the spill files once the session drops this store
+            self._cleanup = weakref.finalize(self, shutil.rmtree, spill_dir, True)
+        else:
+            os.makedirs(spill_dir, exist_ok=True)
+        self.spill_dir = spill_dir
+
+    def __setitem__(self, name, df):
+        if name not in self._paths and name not in self._memory:
+            self._names.append(name)
+        self._memory[name] = df
+        self._memory.move_to_end(name)
+        self._dirty.add(name)
+        self._evict()
+
+    def __getitem__(self, name):
+        if name in self._memory:
+            self._memory.move_to_end(name)
+            return self._memory[name]
+        if name not in self._paths:
+            raise KeyError(name)
+        df = pd.read_pickle(self._paths[name])
+        self._memory[name] = df
+        self._evict()
+        return df
+
+    def __delitem__(self, name):
+        if name not in self._names:
+            raise KeyError(name)
+        self._names.remove(name)
+        self._memory.pop(name, None)
+        self._dirty.discard(name)
+        path = self._paths.pop(name, None)
+        if path and os.path.exists(path):
+            os.remove(path)
+
+    def __contains__(self, name):
+        return name in self._memory or name in self._paths
+
+    def __iter__(self):
+        return iter(list(self._names))
+
+    def __len__(self):
+        return len(self._names)
+
+    def __bool__(self):
+        return bool(self._names)
+
+    def keys(self):
+        return list(self._names)
+
+    def items(self):
+        """Yields (document, DataFrame) pairs, loading spilled documents one at a time."""
+        for name in self.keys():
+            yield name, self[name]
+
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+
+    @property
+    def in_memory_count(self):
+        return len(self._memory)
+
+    def _evict(self):
+        while len(self._memory) > self.max_in_memory:
+            name, df = self._memory.popitem(last=False)
+            if name not in self._dirty:
+                continue  # ✅ Unchanged since it was loaded; the spill file is still current
+            path = self._paths.get(name)
+            if path is None:
+                self._spilled_files += 1
+                path = os.path.join(self.spill_dir, f"{self._spilled_files:06d}.pkl")
+                self._paths[name] = path
+            df.to_pickle(path)
+            self._dirty.discard(name)
@@ -2,13 +2,11 @@ import streamlit as st
 import pandas as pd
 import json
 import datetime
-import pdfplumber
-from io import BytesIO
-from PyPDF2 import PdfReader
 import requests
-from langchain_google_genai import ChatGoogleGenerativeAI
 import re
 import csv
+from pdf_backends import extract_pages
+from reference_lists import load_names
 
 
 # ✅ Set Streamlit Page Layout
@@ -93,20 +91,14 @@ if "transactions" not in st.session_state:
 
 # ✅ Extract Text from PDF (DeepSeek)
 def extract_text_from_pdf(pdf_file):
-    text_pages = []
-    with pdfplumber.open(BytesIO(pdf_file.read())) as pdf:
-        for page in pdf.pages:
-            text = page.extract_text()
-            if text:
-                text_pages.append(text.strip())
-    return text_pages
+    pages, _ = extract_pages(pdf_file, layout=False)  # ✅ Fastest engine that keeps the text, picked per document
+    return [text for _, text in pages]
 
 # ✅ Extract Raw Text for Gemini
 def extract_raw_text(pdf_content):
     try:
-        reader = PdfReader(pdf_content)
-        text = "\n".join(page.extract_text() or "" for page in reader.pages)
-        return text
+        pages, _ = extract_pages(pdf_content, layout=False)
+        return "\n".join(text for _, text in pages)
     except Exception as e:
         st.error(f"Error reading PDF: {str(e)}")
         return ""
@@ -114,10 +106,7 @@ def extract_raw_text(pdf_content):
 # ✅ Load Vendor List
 def load_vendor_list(vendor_file):
     if vendor_file is not None:
-        if vendor_file.name.endswith(".csv"):
-            return pd.read_csv(vendor_file)["Payee"].tolist()
-        else:
-            return pd.read_excel(vendor_file)["Payee"].tolist()
+        return load_names(vendor_file, "Payee")  # ✅ Only the Payee column, cleaned and cached by file hash
     return []
 
 
@@ -227,6 +216,8 @@ def process_and_categorize(text, vendor_list, api_key, ai_model):
             return []
 
     elif ai_model == "Gemini":
+        from langchain_google_genai import ChatGoogleGenerativeAI  # ✅ Imported on first Gemini call
+
         gemini = ChatGoogleGenerativeAI(model="gemini-2.0-pro-exp-02-05", google_api_key=api_key, temperature=0)
 
         try:
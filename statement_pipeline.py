@@ -0,0 +1,423 @@
+import contextvars
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed
+
+import requests
+
+from pdf_backends import extract_pages
+from reference_lists import load_names
+from page_text import normalize_document_pages
+from page_triage import triage_pages, count_transaction_rows, MIN_TRANSACTION_ROWS
+from transactions import validate_transactions
+from reconciliation import reconcile_and_repair
+from pipeline_metrics import bind, span, record_usage, latency_percentile
+from concurrency import MAX_CONCURRENCY, limiter_for, backoff_seconds
+
+
+# ✅ Overridable so benchmarks can point the pipeline at a local stub server
+DEEPSEEK_API_URL = os.environ.get("DEEPSEEK_API_URL", "https://api.deepseek.com/v1/chat/completions")
+
+# ✅ Fast model first, stronger model when the answer fails validation
+MODEL_TIERS = {
+    "DeepSeek": ["deepseek-chat", "deepseek-reasoner"],
+    "Gemini": ["gemini-2.0-flash", "gemini-2.0-pro-exp-02-05"],
+}
+DEFAULT_MODELS = {"DeepSeek": "deepseek-chat", "Gemini": "gemini-2.0-pro-exp-02-05"}
+MIN_ROW_SHARE = 0.5  # ✅ Fewer rows than this share of the page's dated rows means rows were dropped
+
+# ✅ Hedging: duplicate a page to the secondary provider once the primary passes its pXX latency
+HEDGE_PERCENTILE = 90
+HEDGE_MIN_SAMPLES = 20
+HEDGE_DEFAULT_DEADLINE = 20.0  # ✅ Seconds, until enough page latencies are recorded
+MAX_PROVIDER_RETRIES = 3  # ✅ 429/5xx and timeouts are retried under the adaptive limiter before a page is given up
+PROVIDER_CONNECT_TIMEOUT = 10.0
+PROVIDER_READ_TIMEOUT = float(os.environ.get("PROVIDER_READ_TIMEOUT", "180"))  # ✅ Seconds; the reasoner model answers slowly on long pages
+
+
+def extract_text_from_pdf(pdf_source, engine="auto", stats=None, errors=None):
+    """Extract text from a valid, non-corrupt PDF given as a path, a SpooledUpload or an open upload.
+
+    Returns [] when the PDF can't be read; the reason is appended to errors.
+    """
+    try:
+        with span("extract") as event:
+            # ✅ Rows rebuilt from word coordinates, tab between columns; engine picked per document when "auto"
+            text_pages, event["engine"] = extract_pages(pdf_source, engine, stats=stats)
+            event["pages"] = len(text_pages)
+        return text_pages
+
+    except Exception as e:
+        if errors is not None:
+            errors.append(f"Error reading PDF: {e}")
+        return []
+
+
+# ✅ Load Vendor List
+def load_vendor_list(vendor_file):
+    if vendor_file is not None:
+        return load_names(vendor_file, "Payee")  # ✅ Only the Payee column, cleaned and cached by file hash
+    return []
+
+
+def build_prompt(text, vendor_list):
+    """Builds the extraction + vendor-matching prompt for one page of statement text."""
+    return f"""
+    Extract structured transactions from the bank statement and match them to vendors.
+
+    **STRICT RULES:**
+    - Use vendor names **ONLY** from this list:
+      {json.dumps(vendor_list, indent=2)}
+    - Do **NOT** assume vendors. If no match is found, return **"Unknown"**.
+    - Do **NOT** modify transaction descriptions.
+    - Return **pure JSON output** ONLY. No explanations, no additional text.
+
+    **Statement Text:**
+    {text}
+
+    **Output Format (ONLY JSON)**
+    ```json
+    [
+        {{"Date": "MM/DD/YYYY", "Description": "transaction details", "Deposits_Credits": number, "Withdrawals_Debits": number, "Vendor Name": "matched vendor"}},
+        {{"Date": "MM/DD/YYYY", "Description": "another transaction", "Deposits_Credits": number, "Withdrawals_Debits": number, "Vendor Name": "matched vendor"}}
+    ]
+    ```
+
+    **Example:**
+    ```json
+    [
+        {{
+            "Date": "11/01/2023",
+            "Description": "Overdraft Fee for a Transaction Posted on 10/31 $143.00 Dell",
+            "Deposits_Credits": 0,
+            "Withdrawals_Debits": 35.00,
+            "Vendor Name": "Overdraft Fee"
+        }},
+        {{
+            "Date": "11/01/2023",
+            "Description": "ATM Cash Deposit on 11/01 1530 Heitman St Fort Myers FL",
+            "Deposits_Credits": 600.00,
+            "Withdrawals_Debits": 0,
+            "Vendor Name": "ATM"
+        }}
+    ]
+    ```
+    """
+
+
+def _parse_json_rows(content):
+    return json.loads(content.strip("```json").strip("```"))
+
+
+class ProviderError(Exception):
+    """A provider call that failed or returned output that could not be parsed."""
+
+    def __init__(self, message, status_code=None, retry_after=None, transient=False):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.transient = transient  # ✅ Timeout or dropped connection: worth retrying like a 429/5xx
+
+    @property
+    def throttled(self):
+        return self.transient or (self.status_code is not None and (self.status_code == 429 or self.status_code >= 500))
+
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def call_model(prompt, api_key, ai_model, model, attempt=1, tier=0):
+    """Sends one prompt to a provider model and returns the parsed transaction list.
+
+    Raises ProviderError instead of reporting to the UI, so callers decide
+    whether to escalate, hedge, back off or show the error.
+    """
+    if ai_model == "DeepSeek":
+        payload = {"model": model, "messages": [{"role": "user", "content": prompt}], "temperature": 0, "stream": False}
+        headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+        try:
+            with span("provider", provider=ai_model, model=model, tier=tier, retries=attempt - 1) as event:
+                response = requests.post(DEEPSEEK_API_URL, headers=headers, json=payload,
+                                         timeout=(PROVIDER_CONNECT_TIMEOUT, PROVIDER_READ_TIMEOUT))
+                event["status"] = response.status_code
+                if response.status_code == 200:
+                    record_usage(event, response.json().get("usage"))
+        except requests.RequestException as e:
+            # ✅ Connection errors fail this provider, not the page
+            raise ProviderError(f"API request failed: {type(e).__name__}: {e}",
+                                transient=isinstance(e, (requests.Timeout, requests.ConnectionError)))
+
+        if response.status_code != 200:
+            raise ProviderError(f"API call failed: {response.status_code} - {response.text}", response.status_code, _retry_after(response))
+        try:
+            with span("parse", provider=ai_model, model=model) as event:
+                json_data = response.json()["choices"][0]["message"]["content"]
+                transactions = _parse_json_rows(json_data)
+                event["rows"] = len(transactions)
+            return transactions
+        except Exception as e:
+            raise ProviderError(f"Error processing DeepSeek response: {e}")
+
+    elif ai_model == "Gemini":
+        from langchain_google_genai import ChatGoogleGenerativeAI  # ✅ Imported on first Gemini call
+
+        gemini = ChatGoogleGenerativeAI(model=model, google_api_key=api_key, temperature=0, timeout=PROVIDER_READ_TIMEOUT)
+
+        try:
+            with span("provider", provider=ai_model, model=model, tier=tier, retries=attempt - 1) as event:
+                response = gemini.invoke(prompt)
+                record_usage(event, getattr(response, "usage_metadata", None))
+            #Debugging: Show Raw API Response
+            #st.text_area("🔍 Gemini Raw Response", response.content, height=200)
+            if not response or not response.content.strip():
+                raise ProviderError("Gemini API returned an empty response.")
+
+            with span("parse", provider=ai_model, model=model) as event:
+                transactions = _parse_json_rows(response.content)
+
+                for tx in transactions:
+                    tx["Deposits_Credits"] = tx.get("Deposits_Credits", 0) or 0
+                    tx["Withdrawals_Debits"] = tx.get("Withdrawals_Debits", 0) or 0
+                event["rows"] = len(transactions)
+
+            return transactions
+
+        except ProviderError:
+            raise
+        except Exception as e:
+            raise ProviderError(f"Unexpected Gemini API error: {str(e)}", getattr(e, "code", None))
+
+    raise ProviderError(f"Unknown AI model: {ai_model}")
+
+
+def call_model_limited(prompt, api_key, ai_model, model, attempt=1, tier=0):
+    """call_model under the provider/key's adaptive concurrency limit, retrying 429/5xx and timeouts after a backoff."""
+    limiter = limiter_for(ai_model, api_key)
+    for retry in range(MAX_PROVIDER_RETRIES + 1):
+        limiter.acquire()
+        try:
+            answer = call_model(prompt, api_key, ai_model, model, attempt=attempt + retry, tier=tier)
+        except ProviderError as e:
+            # ✅ Back off for Retry-After, or exponentially when the provider sends none
+            limiter.release(ok=not e.throttled, retry_after=backoff_seconds(retry, e.retry_after) if e.throttled else None)
+            if not e.throttled or retry == MAX_PROVIDER_RETRIES:
+                raise
+            continue
+        except Exception:
+            limiter.release(ok=False)
+            raise
+        limiter.release(ok=True)
+        return answer
+
+
+def check_page_output(transactions, text):
+    """Returns the problems that make a model's answer for this page worth escalating."""
+    problems = validate_transactions(transactions)
+    expected_rows = count_transaction_rows(text)
+    if not problems and expected_rows >= MIN_TRANSACTION_ROWS and len(transactions) < expected_rows * MIN_ROW_SHARE:
+        problems.append(f"{len(transactions)} rows returned for {expected_rows} dated rows on the page")
+    return problems
+
+
+def categorize_prompt(prompt, text, api_key, ai_model, attempt=1, tiered=False):
+    """Gets transactions for one page prompt from one provider, escalating through MODEL_TIERS if tiered.
+
+    Returns the answer or raises the last ProviderError; never touches the UI,
+    so it can run on hedging worker threads.
+    """
+    models = MODEL_TIERS[ai_model] if tiered else [DEFAULT_MODELS[ai_model]]
+    if tiered and attempt > 1:
+        models = models[-1:]  # ✅ Reconciliation re-queries go straight to the stronger model
+    transactions, error = None, None
+    with span("categorize", provider=ai_model):
+        for model in models:
+            tier = MODEL_TIERS[ai_model].index(model)
+            try:
+                answer = call_model_limited(prompt, api_key, ai_model, model, attempt=attempt, tier=tier)
+            except ProviderError as e:
+                error = e
+                continue
+            transactions = answer
+            if model == models[-1]:
+                break
+            with span("validate", provider=ai_model, model=model, tier=tier) as validate_event:
+                problems = check_page_output(answer, text)
+                validate_event.update(problems=len(problems), escalate=bool(problems))
+            if not problems:
+                break
+        if transactions is None:
+            raise error  # ✅ Recorded as a failed span, so it doesn't count towards the hedging deadline
+    return transactions
+
+
+def hedge_deadline(ai_model, percentile):
+    """Seconds to wait for the primary provider before hedging: its recent page-latency percentile."""
+    deadline = latency_percentile("categorize", ai_model, percentile, min_samples=HEDGE_MIN_SAMPLES)
+    return HEDGE_DEFAULT_DEADLINE if deadline is None else deadline
+
+
+def categorize_hedged(prompt, text, attempt, tiered, primary, secondary, percentile):
+    """Sends the page to the primary (ai_model, api_key) and, if no valid answer arrived by the
+    primary's latency percentile, a duplicate to the secondary; the first valid answer wins.
+
+    Each call gets its own two threads, so a duplicate never waits behind
+    other pages' requests and the deadline is spent on the provider only.
+    """
+    deadline = hedge_deadline(primary[0], percentile)
+    pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="hedge")
+
+    def submit(route):
+        # ✅ Each worker gets a copy of the bound run/document/page metrics context
+        return pool.submit(contextvars.copy_context().run, categorize_prompt, prompt, text, route[1], route[0], attempt, tiered)
+
+    fallback, error = None, None
+    try:
+        with span("hedge", provider=primary[0], deadline_s=round(deadline, 3)) as event:
+            primary_future = submit(primary)
+            futures = {primary_future: primary[0]}
+            done, _ = wait(futures, timeout=deadline)
+            primary_valid = bool(done) and primary_future.exception() is None and not check_page_output(primary_future.result(), text)
+            if not primary_valid:
+                futures[submit(secondary)] = secondary[0]
+            event.update(hedged=len(futures) > 1, winner=None)
+
+            for future in as_completed(futures):
+                try:
+                    answer = future.result()
+                except ProviderError as e:
+                    error = e
+                    continue
+                except Exception as e:
+                    error = ProviderError(f"{futures[future]} failed: {type(e).__name__}: {e}")  # ✅ Still wait for the other provider
+                    continue
+                if not check_page_output(answer, text):
+                    event["winner"] = futures[future]
+                    return answer
+                if fallback is None:
+                    fallback = answer
+    finally:
+        pool.shutdown(wait=False)  # ✅ The slower duplicate finishes in the background and is ignored
+    if fallback is None:
+        raise error
+    return fallback
+
+
+def categorize_page(text, vendor_list, api_key, ai_model, attempt=1, tiered=False, hedge=None):
+    """Builds the page prompt and returns the model's transactions; raises ProviderError.
+
+    With tiered=True the page goes to the provider's fast model first and is
+    escalated to the stronger model only when the answer fails validation
+    (JSON shape, fields, dates, amounts, row count). hedge={"ai_model",
+    "api_key", "percentile"} names a secondary provider that gets a duplicate
+    request when the primary is slower than its recent percentile latency.
+    Prompt build, provider call, parsing and validation are recorded as
+    separate spans; attempt > 1 marks the call as a retry.
+    """
+    with span("prompt", provider=ai_model) as event:
+        prompt = build_prompt(text, vendor_list)
+        event["prompt_chars"] = len(prompt)
+
+    if hedge and hedge.get("api_key"):
+        transactions = categorize_hedged(prompt, text, attempt, tiered, (ai_model, api_key),
+                                         (hedge["ai_model"], hedge["api_key"]), hedge.get("percentile", HEDGE_PERCENTILE))
+    else:
+        transactions = categorize_prompt(prompt, text, api_key, ai_model, attempt, tiered)
+    return transactions if isinstance(transactions, list) else []
+
+
+# ✅ Process Transactions with AI Model
+def process_and_categorize(text, vendor_list, api_key, ai_model, attempt=1, tiered=False, hedge=None, errors=None):
+    """Processes transactions and categorizes them in one API call (see categorize_page).
+
+    A ProviderError gives no transactions; its message is appended to errors.
+    """
+    try:
+        return categorize_page(text, vendor_list, api_key, ai_model, attempt, tiered, hedge)
+    except ProviderError as e:
+        if errors is not None:
+            errors.append(str(e))
+        return []
+
+
+def process_document(pdf_source, vendor_list, api_key, ai_model, document=None, skip_pages=True, on_page=None, tiered=False,
+                     hedge=None, pdf_engine="auto"):
+    """Runs one PDF through extraction, normalization, triage, the AI model and reconciliation.
+
+    Pages are sent concurrently, as many at a time as the provider's
+    adaptive limiter allows. on_page(index, page_num, info) is called on the
+    calling thread as each page comes back; tiered and hedge are passed on
+    to categorize_page and pdf_engine picks the PDF text backend. Returns
+    (DataFrame or None, info) where info holds page and token counts, the
+    skipped and failed pages, the reconciliation report and "errors", the
+    messages a UI should show. Nothing here calls Streamlit. Every stage is recorded in
+    pipeline_metrics under the caller's bound run_id and this document.
+    """
+    context = {"document": document} if document is not None else {}  # ✅ Keep a name bound by the caller
+    with bind(**context), span("document", provider=ai_model) as event:
+        df, info = _process_document(pdf_source, vendor_list, api_key, ai_model, document, skip_pages, on_page, tiered, hedge, pdf_engine)
+        event.update(pages=info["pages"], sent_pages=info["sent_pages"], rows=0 if df is None else len(df),
+                     status=(info["reconciliation"] or {}).get("status"))
+    return df, info
+
+
+def _categorize_page_in_context(page_num, *args):
+    with bind(page=page_num):
+        return categorize_page(*args)
+
+
+def _process_document(pdf_source, vendor_list, api_key, ai_model, document, skip_pages, on_page, tiered, hedge, pdf_engine):
+    info = {"pages": 0, "sent_pages": 0, "skipped_pages": [], "failed_pages": [], "tokens_before": 0, "tokens_after": 0,
+            "reconciliation": None, "errors": []}
+    extract_stats = {}
+    text_pages = extract_text_from_pdf(pdf_source, pdf_engine, extract_stats, info["errors"])
+    if not text_pages:
+        return None, info
+
+    # ✅ Strip repeated headers/footers; savings are measured against the text before compaction
+    text_pages, (info["tokens_before"], info["tokens_after"]) = normalize_document_pages(text_pages, extract_stats.get("tokens"))
+    info["pages"] = len(text_pages)
+    all_pages = text_pages  # ✅ Balance lines may sit on pages triage skips
+    if skip_pages:
+        text_pages, info["skipped_pages"] = triage_pages(text_pages)
+    info["sent_pages"] = len(text_pages)
+
+    page_records = {}  # ✅ Transactions per page, so reconciliation can re-query single pages
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_CONCURRENCY, len(text_pages))), thread_name_prefix="page") as pool:
+        futures = {
+            pool.submit(contextvars.copy_context().run, _categorize_page_in_context, page_num,
+                        page_text, vendor_list, api_key, ai_model, 1, tiered, hedge): page_num
+            for page_num, page_text in text_pages
+        }
+        # ✅ Progress and errors are reported here on the calling thread
+        for index, future in enumerate(as_completed(futures)):
+            page_num = futures[future]
+            try:
+                page_records[page_num] = future.result()
+            except Exception as e:  # ✅ One failed page never aborts the document or the bulk run
+                info["failed_pages"].append({"page": page_num, "error": str(e)})
+                info["errors"].append(f"Page {page_num}: {e}")
+                page_records[page_num] = []
+            if on_page:
+                on_page(index, page_num, info)
+
+    if not any(page_records.values()):
+        return None, info
+
+    page_texts = dict(all_pages)
+
+    def requery_page(page_num):
+        with bind(page=page_num):
+            requery_errors = []
+            transactions = process_and_categorize(page_texts[page_num], vendor_list, api_key, ai_model, attempt=2, tiered=tiered,
+                                                  hedge=hedge, errors=requery_errors)
+            info["errors"].extend(f"Page {page_num} re-query: {error}" for error in requery_errors)
+            return transactions
+
+    with span("reconcile") as event:
+        df, info["reconciliation"] = reconcile_and_repair(page_records, all_pages, requery_page, document=document)
+        event.update(status=info["reconciliation"]["status"], requeried_pages=len(info["reconciliation"]["requeried_pages"]))
+    return df, info
@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+
+
+DATE_FORMAT = "%m/%d/%Y"
+AMOUNT_COLUMNS = ["Deposits_Credits", "Withdrawals_Debits"]
+CATEGORY_COLUMNS = ["Vendor Name", "Document"]
+BASE_COLUMNS = ["Date", "Description", "Deposits_Credits", "Withdrawals_Debits", "Vendor Name"]
+
+
+def _clean_amount_text(values):
+    text = pd.Series(values, dtype=object).astype(str).str.strip()
+    text = text.str.replace(r"^\((.*)\)$", r"-\1", regex=True)  # (35.00) -> -35.00
+    return text.str.replace(r"[$,\s]", "", regex=True)
+
+
+def parse_amounts_to_cents(values):
+    """Converts LLM amount values (numbers, "$1,234.50", "(35.00)", None) to int64 cents."""
+    amounts = pd.to_numeric(_clean_amount_text(values), errors="coerce").fillna(0).to_numpy(dtype="float64")
+    return np.round(amounts * 100).astype("int64")
+
+
+def validate_transactions(records):
+    """Returns a list of problems with raw LLM transaction output; empty when every row is usable.
+
+    Checks the JSON shape, the expected fields, MM/DD/YYYY dates and that
+    non-empty amounts parse as numbers.
+    """
+    if not isinstance(records, list):
+        return ["output is not a JSON list"]
+    if not all(isinstance(record, dict) for record in records):
+        return ["output rows are not JSON objects"]
+    if not records:
+        return []
+
+    problems = []
+    missing = [column for column in BASE_COLUMNS if any(column not in record for record in records)]
+    if missing:
+        problems.append(f"missing fields: {', '.join(missing)}")
+
+    dates = pd.to_datetime(pd.Series([record.get("Date") for record in records], dtype=object), format=DATE_FORMAT, errors="coerce")
+    if dates.isna().any():
+        problems.append(f"{int(dates.isna().sum())} unparseable dates")
+
+    for column in AMOUNT_COLUMNS:
+        text = _clean_amount_text([record.get(column) for record in records])
+        unparseable = pd.to_numeric(text, errors="coerce").isna() & ~text.isin(["", "None", "nan"])
+        if unparseable.any():
+            problems.append(f"{int(unparseable.sum())} unparseable {column} amounts")
+    return problems
+
+
+def normalize_transactions(records, document=None):
+    """Builds a compact typed DataFrame from raw LLM transaction dicts.
+
+    Dates become datetime64, amounts become int64 cents and the repeated
+    Vendor Name / Document strings become categoricals.
+    """
+    df = pd.DataFrame(records)
+    for column in BASE_COLUMNS:
+        if column not in df.columns:
+            df[column] = None
+
+    df["Date"] = pd.to_datetime(df["Date"], format=DATE_FORMAT, errors="coerce")
+    df["Description"] = df["Description"].fillna("").astype(str)
+    for column in AMOUNT_COLUMNS:
+        df[column] = parse_amounts_to_cents(df[column])
+    df["Vendor Name"] = df["Vendor Name"].fillna("Unknown").astype(str).astype("category")
+
+    if document is not None:
+        # ✅ One category shared by every row instead of a string per row
+        df["Document"] = pd.Categorical.from_codes(np.zeros(len(df), dtype="int8"), categories=[document])
+    elif "Document" in df.columns:
+        df["Document"] = df["Document"].astype(str).astype("category")
+
+    if "Page" in df.columns:
+        df["Page"] = pd.to_numeric(df["Page"], errors="coerce").fillna(0).astype("int16")
+
+    ordered = [c for c in BASE_COLUMNS + ["Document", "Page"] if c in df.columns]
+    return df[ordered + [c for c in df.columns if c not in ordered]].reset_index(drop=True)
+
+
+def to_display_frame(df):
+    """Converts a normalized frame back to strings and dollar floats for display, CSV and prompts."""
+    out = df.copy()
+    if "Date" in out.columns and pd.api.types.is_datetime64_any_dtype(out["Date"]):
+        out["Date"] = out["Date"].dt.strftime(DATE_FORMAT).fillna("")
+    for column in AMOUNT_COLUMNS:
+        if column in out.columns and pd.api.types.is_integer_dtype(out[column]):
+            out[column] = out[column] / 100
+    for column in CATEGORY_COLUMNS:
+        if column in out.columns and isinstance(out[column].dtype, pd.CategoricalDtype):
+            out[column] = out[column].astype(str)
+    return out
+
+
+def to_dollars(cents):
+    """Converts a cents value from a normalized frame to a float dollar amount."""
+    return float(cents) / 100
+
+
+def apply_correction(df, mask, vendor_name, deposits, withdrawals):
+    """Writes a feedback correction (dollar amounts) into a normalized frame in place."""
+    if vendor_name not in df["Vendor Name"].cat.categories:
+        df["Vendor Name"] = df["Vendor Name"].cat.add_categories([vendor_name])
+    df.loc[mask, "Vendor Name"] = vendor_name
+    df.loc[mask, "Deposits_Credits"] = int(round(float(deposits) * 100))
+    df.loc[mask, "Withdrawals_Debits"] = int(round(float(withdrawals) * 100))
+    return df
+
+
+def filter_transactions(df, search="", start_date=None, end_date=None, vendors=None, min_amount=None, max_amount=None):
+    """Boolean mask of rows matching every given filter; amounts are dollars, compared on the row's absolute amount."""
+    mask = np.ones(len(df), dtype=bool)
+    if search:
+        description = df["Description"].str.contains(search, case=False, regex=False, na=False)
+        vendor = df["Vendor Name"].astype(str).str.contains(search, case=False, regex=False, na=False)
+        mask &= (description | vendor).to_numpy()
+    if start_date is not None:
+        mask &= (df["Date"] >= pd.Timestamp(start_date)).to_numpy()
+    if end_date is not None:
+        mask &= (df["Date"] < pd.Timestamp(end_date) + pd.Timedelta(days=1)).to_numpy()
+    if vendors:
+        mask &= df["Vendor Name"].isin(vendors).to_numpy()
+    if min_amount is not None or max_amount is not None:
+        cents = (df["Deposits_Credits"] + df["Withdrawals_Debits"]).to_numpy()  # ✅ One side is zero on every row
+        if min_amount is not None:
+            mask &= cents >= round(min_amount * 100)
+        if max_amount is not None:
+            mask &= cents <= round(max_amount * 100)
+    return mask
+
+
+def summarize_amounts(df, by):
+    """Sums cents columns by a key and returns dollar totals for charting."""
+    grouped = df.groupby(by, observed=True)[AMOUNT_COLUMNS].sum()
+    return (grouped / 100).reset_index()
@@ -0,0 +1,84 @@
+import hashlib
+import io
+import mmap
+import os
+import tempfile
+from collections import namedtuple
+from contextlib import contextmanager
+
+
+CHUNK_SIZE = 1024 * 1024
+
+# ✅ Plain picklable record so worker processes can share an upload by path
+SpooledUpload = namedtuple("SpooledUpload", ["name", "path", "size", "sha256"])
+
+
+def spool_upload(uploaded_file, spool_dir=None):
+    """Writes an uploaded file to a temp file once, hashing it on the way, and returns a SpooledUpload."""
+    suffix = os.path.splitext(uploaded_file.name)[1]
+    handle, path = tempfile.mkstemp(prefix="upload_", suffix=suffix, dir=spool_dir)
+    digest = hashlib.sha256()
+    size = 0
+    with os.fdopen(handle, "wb") as out:
+        if hasattr(uploaded_file, "getbuffer"):
+            # ✅ Streamlit uploads are BytesIO: slice the buffer instead of copying it with getvalue()
+            buffer = uploaded_file.getbuffer()
+            try:
+                for start in range(0, len(buffer), CHUNK_SIZE):
+                    chunk = buffer[start:start + CHUNK_SIZE]
+                    digest.update(chunk)
+                    out.write(chunk)
+                size = len(buffer)
+            finally:
+                buffer.release()
+        else:
+            uploaded_file.seek(0)
+            while True:
+                chunk = uploaded_file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+    return SpooledUpload(uploaded_file.name, path, size, digest.hexdigest())
+
+
+def discard_upload(upload):
+    """Deletes the temp file behind a SpooledUpload."""
+    if upload and os.path.exists(upload.path):
+        os.remove(upload.path)
+
+
+@contextmanager
+def open_mapped(path):
+    """Opens a file as a read-only memory map that parsers can use like a binary stream."""
+    with open(path, "rb") as fh:
+        if os.fstat(fh.fileno()).st_size == 0:
+            yield io.BytesIO(b"")  # mmap cannot map empty files
+            return
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+
+@contextmanager
+def open_pdf_source(source):
+    """Yields a binary stream for a path, a SpooledUpload or an already-open file object."""
+    if isinstance(source, SpooledUpload):
+        source = source.path
+    if isinstance(source, (str, os.PathLike)):
+        with open_mapped(source) as stream:
+            yield stream
+    else:
+        source.seek(0)
+        yield source
+
+
+def count_pdf_pages(source):
+    """Counts pages from the PDF page tree without extracting any text."""
+    try:
+        with open_pdf_source(source) as stream:
+            from PyPDF2 import PdfReader  # ✅ Imported on first use, not at app start
+
+            return len(PdfReader(stream).pages)
+    except Exception:
+        return 0